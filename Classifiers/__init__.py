@@ -1 +1,13 @@
-from .model import prepare_data,calculate_sma_ema,plot_data
\ No newline at end of file
+from Metrics.startup import lazy_exports
+
+# Loaded on first access, pandas and Plotly are only imported by the code that uses them
+__getattr__ = lazy_exports(__name__, {
+    'prepare_data': '.model',
+    'calculate_sma_ema': '.model',
+    'plot_data': '.model',
+    'compute_indicators': '.indicators',
+    'market_indicators': '.indicators',
+    'screen_market': '.screener',
+    'load_market': '.market_data',
+    'load_market_matrix': '.market_data',
+})
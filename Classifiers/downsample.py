@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def bucket_bounds(length, max_points):
+    """
+        Start index of each of `max_points` contiguous, near equal buckets over `length` rows.
+    """
+    return np.unique(np.arange(max_points) * length // max_points)
+
+
+def bucket_ohlcv(dates, close, high, low, volume, lines, max_points):
+    """
+        Downsamples a price series to at most `max_points` candles with min/max bucketing.
+
+        Every bucket of consecutive rows becomes one candle: opened at the first close,
+        closed at the last, with the highest high, lowest low and summed volume, so
+        spikes survive no matter how long the history is. Indicator `lines` take the
+        value at the end of each bucket.
+
+        Args:
+            dates (ndarray): Row dates.
+            close, high, low, volume (ndarray): float arrays, NaN for missing values.
+            lines (dict): Name -> float array of indicator values per row.
+            max_points (int): Maximum number of candles.
+
+        Returns:
+            dict: 'date', 'open', 'high', 'low', 'close', 'volume' and every line, as arrays.
+    """
+    length = len(close)
+    if length <= max_points:
+        return dict(date=dates, open=close, high=high, low=low, close=close, volume=volume, **lines)
+
+    starts = bucket_bounds(length, max_points)
+    ends = np.append(starts[1:], length) - 1
+
+    def reduce(function, values):
+        # fmax/fmin ignore NaN unless the whole bucket is NaN
+        return function.reduceat(values, starts)
+
+    candles = dict(
+        date=dates[starts],
+        open=close[starts],
+        high=reduce(np.fmax, np.fmax(high, close)),
+        low=reduce(np.fmin, np.fmin(low, close)),
+        close=close[ends],
+        volume=reduce(np.add, np.nan_to_num(volume)),
+    )
+    for name, values in lines.items():
+        candles[name] = values[ends]
+    return candles
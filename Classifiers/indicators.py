@@ -0,0 +1,181 @@
+"""
+Vectorized technical indicators over a whole market at once.
+
+Every function takes 2D float arrays shaped (dates, codes), one column per issuer
+with NaN where there is no value, and returns arrays of the same shape. Rolling
+windows that contain a NaN give NaN, like pandas' rolling(window).
+
+Example usage:
+    indicators = market_indicators()
+    indicators['rsi_14'].iloc[-1]  # latest RSI of every issuer
+"""
+import numpy as np
+import pandas as pd
+
+from Data.db_functions import get_price_matrix
+
+
+def _rolling_sum(values, window):
+    # Sum over the last `window` rows, NaN unless all of them are present
+    out = np.full(values.shape, np.nan)
+    if window > len(values):
+        return out
+    present = ~np.isnan(values)
+    zeros = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([zeros, np.cumsum(np.where(present, values, 0.0), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(present, axis=0)])
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    out[window - 1:] = np.where(window_counts == window, window_sums, np.nan)
+    return out
+
+
+def _rolling_extreme(values, window, extreme):
+    # Rolling max/min as `window` shifted element-wise comparisons, NaN propagates
+    out = np.full(values.shape, np.nan)
+    if window > len(values):
+        return out
+    result = values[window - 1:].copy()
+    for offset in range(1, window):
+        result = extreme(result, values[window - 1 - offset:len(values) - offset])
+    out[window - 1:] = result
+    return out
+
+
+def _ewm(values, alpha):
+    # The recursion can't be written as array operations, so run pandas' compiled
+    # ewm kernel over all columns at once instead of a Python loop over the rows
+    return pd.DataFrame(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _previous(values):
+    shifted = np.full(values.shape, np.nan)
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def sma(close, window=14):
+    return _rolling_sum(close, window) / window
+
+
+def ema(close, span=14):
+    return _ewm(close, 2 / (span + 1))
+
+
+def rsi(close, window=14):
+    """
+        Wilder's relative strength index, 0-100. A flat price (no gains and no
+        losses) is neutral at 50, only gains without losses give 100.
+    """
+    delta = close - _previous(close)
+    gain = _ewm(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), 1 / window)
+    loss = _ewm(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), 1 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100 - 100 / (1 + gain / loss)
+    value = np.where((loss == 0) & (gain > 0), 100.0, value)
+    return np.where((loss == 0) & (gain == 0), 50.0, value)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """
+        Returns (macd line, signal line, histogram).
+    """
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, window=20, num_std=2.0):
+    """
+        Returns (middle, upper, lower) bands, using the population standard deviation.
+    """
+    middle = sma(close, window)
+    mean_of_squares = _rolling_sum(close * close, window) / window
+    deviation = np.sqrt(np.maximum(mean_of_squares - middle * middle, 0.0))
+    return middle, middle + num_std * deviation, middle - num_std * deviation
+
+
+def stochastic(high, low, close, k_window=14, d_window=3):
+    """
+        Returns (%K, %D) of the stochastic oscillator.
+    """
+    highest = _rolling_extreme(high, k_window, np.maximum)
+    lowest = _rolling_extreme(low, k_window, np.minimum)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.where(highest > lowest, 100 * (close - lowest) / (highest - lowest), 50.0)
+    k = np.where(np.isnan(highest) | np.isnan(lowest) | np.isnan(close), np.nan, k)
+    return k, sma(k, d_window)
+
+
+def atr(high, low, close, window=14):
+    """
+        Wilder's average true range.
+    """
+    previous_close = _previous(close)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    return _ewm(true_range, 1 / window)
+
+
+def obv(close, volume):
+    """
+        On-balance volume, starting from 0 at each issuer's first price.
+    """
+    direction = np.sign(close - _previous(close))
+    flow = np.where(np.isnan(direction) | np.isnan(volume), 0.0, direction * volume)
+    return np.where(np.isnan(close), np.nan, np.cumsum(flow, axis=0))
+
+
+def compute_indicators(close, high=None, low=None, volume=None):
+    """
+        Computes every indicator for a (dates, codes) price matrix in one pass.
+
+        high/low default to the close when missing (days without a trade), volume
+        is only needed for OBV.
+
+        Returns:
+            dict: Indicator name -> (dates, codes) array.
+    """
+    high = close if high is None else np.where(np.isnan(high), close, high)
+    low = close if low is None else np.where(np.isnan(low), close, low)
+
+    macd_line, macd_signal, macd_histogram = macd(close)
+    bollinger_middle, bollinger_upper, bollinger_lower = bollinger(close)
+    stochastic_k, stochastic_d = stochastic(high, low, close)
+    indicators = {
+        'sma_14': sma(close, 14),
+        'ema_14': ema(close, 14),
+        'rsi_14': rsi(close, 14),
+        'macd': macd_line,
+        'macd_signal': macd_signal,
+        'macd_histogram': macd_histogram,
+        'bollinger_middle': bollinger_middle,
+        'bollinger_upper': bollinger_upper,
+        'bollinger_lower': bollinger_lower,
+        'stochastic_k': stochastic_k,
+        'stochastic_d': stochastic_d,
+        'atr_14': atr(high, low, close, 14),
+    }
+    if volume is not None:
+        indicators['obv'] = obv(close, volume)
+    return indicators
+
+
+def market_indicators(start=None, end=None):
+    """
+        Loads every issuer with a single query and computes all indicators at once.
+
+        Prices are carried forward over days an issuer did not trade, and the
+        max/min of 0 the site reports for those days counts as missing.
+
+        Returns:
+            dict: Indicator name -> DataFrame indexed by date with one column per code.
+    """
+    matrices = get_price_matrix(start=start, end=end)
+    close = matrices['last_trade_price'].replace(0, np.nan).ffill()
+    high = matrices['max_price'].replace(0, np.nan)
+    low = matrices['min_price'].replace(0, np.nan)
+    volume = matrices['volume'].fillna(0)
+
+    indicators = compute_indicators(close.to_numpy(), high.to_numpy(), low.to_numpy(), volume.to_numpy())
+    return {name: pd.DataFrame(values, index=close.index, columns=close.columns)
+            for name, values in indicators.items()}
@@ -0,0 +1,74 @@
+"""
+Whole-market reads from the Parquet archive written by Data.archive.
+
+The partition files are memory mapped and only the requested columns and
+partitions are read, so every issuer comes back as one DataFrame in a single
+call instead of one database query per company.
+"""
+import pandas as pd
+
+from Data.archive import ARCHIVE_PATH
+from Data.db_functions import MATRIX_COLUMNS
+
+
+def _dataset(path):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow.fs import LocalFileSystem
+
+    partitioning = ds.partitioning(pa.schema([('code', pa.string()), ('year', pa.int32())]), flavor='hive')
+    return ds.dataset(path, format='parquet', partitioning=partitioning, filesystem=LocalFileSystem(use_mmap=True))
+
+
+def load_market(columns=None, codes=None, start=None, end=None, path=ARCHIVE_PATH):
+    """
+        Loads the archived history of every company as one long DataFrame.
+
+        Args:
+            columns (list): Value columns to read, all of them by default.
+            codes (list): Optional company codes to include.
+            start (datetime.date): Optional first date to include.
+            end (datetime.date): Optional last date to include.
+            path (str): Directory of the archive.
+
+        Returns:
+            DataFrame: 'code' (categorical), 'date' and the value columns, sorted by code and date.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = _dataset(path)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in ('code', 'year', 'date')]
+
+    # Conditions on the partition fields skip whole files before anything is read
+    conditions = []
+    if codes is not None:
+        conditions.append(ds.field('code').isin(list(codes)))
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions.append((ds.field('year') >= start.year) & (ds.field('date') >= start.date()))
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions.append((ds.field('year') <= end.year) & (ds.field('date') <= end.date()))
+    condition = None
+    for part in conditions:
+        condition = part if condition is None else condition & part
+
+    table = dataset.to_table(columns=['code', 'date', *columns], filter=condition) \
+        .sort_by([('code', 'ascending'), ('date', 'ascending')])
+    # Categorical codes and datetime64[ns] dates come straight from Arrow, without Python objects
+    table = table.set_column(0, 'code', pc.dictionary_encode(table['code'])) \
+        .set_column(1, 'date', pc.cast(table['date'], pa.timestamp('ns')))
+    return table.to_pandas()
+
+
+def load_market_matrix(columns=MATRIX_COLUMNS, start=None, end=None, path=ARCHIVE_PATH):
+    """
+        Same as Data.db_functions.get_price_matrix, read from the archive: one
+        (date x code) DataFrame per column, NaN where a company has no row that day.
+    """
+    market = load_market(columns, start=start, end=end, path=path)
+    market['code'] = market['code'].astype(str)
+    return {column: market.pivot(index='date', columns='code', values=column) for column in columns}
@@ -1,85 +1,41 @@
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from Data.db_functions import get_company_data_by_code, get_last_update_for_all_companies
-from datetime import datetime
-
-
-# Helper function to check if the date is valid
-def is_valid_date(date_str):
-    try:
-        datetime.strptime(date_str, '%d.%m.%Y')  # Validate the format
-        return True
-    except ValueError:
-        return False
-
-
-# Function to convert company data to a dictionary with valid dates
-def company_data_to_dict(company_data_list):
-    data_dict = []
-    for company_data in company_data_list:
-        if not is_valid_date(company_data.date):
-            continue
-        data_dict.append({
-            'date': datetime.strptime(company_data.date, '%d.%m.%Y'),  # Convert string to datetime
-            'last_trade_price': float(company_data.last_trade_price) if company_data.last_trade_price else None,
-            'max_price': float(company_data.max_price) if company_data.max_price else None,
-            'min_price': float(company_data.min_price) if company_data.min_price else None,
-            'avg_price': float(company_data.avg_price) if company_data.avg_price else None,
-            'percent_change': float(company_data.percent_change) if company_data.percent_change else None,
-            'volume': float(company_data.volume) if company_data.volume else None,
-            'turnover_best_denars': float(company_data.turnover_best_denars) if company_data.turnover_best_denars else None,
-            'total_turnover_denars': float(company_data.total_turnover_denars) if company_data.total_turnover_denars else None
-        })
-    return data_dict
+from Data.db_functions import BAR_AGGREGATIONS, get_company_frame, get_rollup_frame
+from Classifiers.indicators import sma, ema
+from Classifiers.downsample import bucket_ohlcv
 
 
 # Main data preparation function
-def prepare_data(company_data_list):
-    # Convert raw data into a dictionary
-    data = company_data_to_dict(company_data_list)
+def prepare_data(df):
+    # Takes the frame returned by get_company_frame
+    if df.empty:
+        raise ValueError("The data does not contain any dated rows.")
 
-    # Create a DataFrame
-    df = pd.DataFrame(data)
-
-    # Ensure the 'date' column exists
-    if 'date' not in df.columns:
-        raise ValueError("The data does not contain a 'date' column.")
-
-    # Set 'date' as the index
-    df.set_index('date', inplace=True)
+    # The site shows empty cells for days without trades, they are stored as 0
+    df = df.replace(0, np.nan)
 
     # Resample data to daily, weekly, and monthly periods
     daily = df.copy()
 
-    weekly = df.resample('W').agg({
-        'last_trade_price': 'mean',
-        'volume': 'sum',
-        'percent_change': 'mean',
-        'max_price': 'max',
-        'min_price': 'min',
-    }).ffill()
-
-    monthly = df.resample('M').agg({
-        'last_trade_price': 'mean',
-        'volume': 'sum',
-        'percent_change': 'mean',
-        'max_price': 'max',
-        'min_price': 'min',
-    }).ffill()
+    weekly = df.resample('W-SUN').agg(BAR_AGGREGATIONS).ffill()
+
+    monthly = df.resample('ME').agg(BAR_AGGREGATIONS).ffill()
 
     return daily, weekly, monthly
 
 
 # Function to calculate SMA and EMA for price data
 def calculate_sma_ema(df, window_sma=14, window_ema=14):
-    # Calculate Simple Moving Average (SMA) and Exponential Moving Average (EMA)
-    df['SMA'] = df['last_trade_price'].rolling(window=window_sma).mean()
-    df['EMA'] = df['last_trade_price'].ewm(span=window_ema, adjust=False).mean()
-    return df
+    # Calculate Simple Moving Average (SMA) and Exponential Moving Average (EMA) on a copy
+    close = df[['last_trade_price']].to_numpy(dtype=np.float64)
+    return df.assign(SMA=sma(close, window_sma)[:, 0], EMA=ema(close, window_ema)[:, 0])
 
 
 # Function to plot the data using Plotly
 def plot_data(df, title):
+    # Plotly is slow to import and only needed here
+    import plotly.graph_objects as go
+
     # Create a Plotly figure with candlestick chart and SMA/EMA lines
     fig = go.Figure()
 
@@ -107,3 +63,41 @@ def plot_data(df, title):
     )
 
     return fig
+
+
+# Function to read the bars a chart payload is built from
+def load_bars(code, timeframe='M'):
+    if timeframe == 'D':
+        return get_company_frame(code, columns=list(BAR_AGGREGATIONS)).replace(0, np.nan)
+    return get_rollup_frame(code, timeframe)
+
+
+# Function to turn bars into the compact columnar chart payload served by /api/ohlcv
+def bars_payload(code, timeframe, bars, start=None, end=None, max_points=1000, window_sma=14, window_ema=14):
+    # Indicators over the whole history, so a zoomed range doesn't restart them
+    bars = calculate_sma_ema(bars, window_sma, window_ema)
+    bars = bars.loc[start:end]
+
+    candles = bucket_ohlcv(
+        bars.index.strftime('%Y-%m-%d').to_numpy(),
+        bars['last_trade_price'].to_numpy(),
+        bars['max_price'].to_numpy(),
+        bars['min_price'].to_numpy(),
+        bars['volume'].to_numpy(),
+        {'sma': bars['SMA'].to_numpy(), 'ema': bars['EMA'].to_numpy()},
+        max_points
+    )
+
+    payload = {'code': code, 'tf': timeframe, 'total': len(bars), 'points': len(candles['date'])}
+    for name, values in candles.items():
+        if values.dtype.kind == 'f':
+            # JSON has no NaN, missing values become null
+            values = np.round(values, 4).astype(object)
+            values[pd.isna(values)] = None
+        payload[name] = values.tolist()
+    return payload
+
+
+# Function to build the chart payload of a company straight from the database
+def ohlcv_payload(code, timeframe='M', start=None, end=None, max_points=1000, window_sma=14, window_ema=14):
+    return bars_payload(code, timeframe, load_bars(code, timeframe), start, end, max_points, window_sma, window_ema)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from Classifiers.indicators import sma, ema, rsi, macd, bollinger
+from Data.db_functions import get_recent_company_data
+
+# Calendar days of history loaded per issuer, enough to warm up the 26-period MACD EMA
+LOOKBACK_DAYS = 200
+
+SCREENER_INDICATORS = ['sma_14', 'ema_14', 'rsi_14', 'macd_histogram', 'bollinger_upper', 'bollinger_lower']
+
+# Stored columns the screener reads
+SCREENER_COLUMNS = ['last_trade_price', 'percent_change', 'volume', 'max_price', 'min_price']
+
+SCREENER_FIELDS = [*SCREENER_COLUMNS, *SCREENER_INDICATORS]
+
+
+def screener_indicators(close):
+    # Only what the screener shows, computed for all issuers at once
+    _, _, macd_histogram = macd(close)
+    _, bollinger_upper, bollinger_lower = bollinger(close)
+    return {
+        'sma_14': sma(close, 14),
+        'ema_14': ema(close, 14),
+        'rsi_14': rsi(close, 14),
+        'macd_histogram': macd_histogram,
+        'bollinger_upper': bollinger_upper,
+        'bollinger_lower': bollinger_lower,
+    }
+
+
+def screen_market(sort_by='percent_change', descending=True, filters=None, limit=None):
+    """
+        Latest price, % change, volume and indicators for every issuer in one pass.
+
+        Loads the recent history of all issuers with one grouped query, pivots the close
+        into a (date x code) matrix and computes the indicators for all issuers at once. Indicator
+        values are computed over the last LOOKBACK_DAYS only, which is fine for screening.
+
+        Args:
+            sort_by (str): Field to sort on, one of SCREENER_FIELDS or 'code'.
+            descending (bool): Sort order.
+            filters (dict): Field -> (minimum, maximum), either bound may be None.
+            limit (int): Optional maximum number of rows.
+
+        Returns:
+            list: One dict per issuer with 'code', 'date' and SCREENER_FIELDS.
+    """
+    recent = get_recent_company_data(LOOKBACK_DAYS, SCREENER_COLUMNS)
+    if recent.empty:
+        return []
+
+    # The site shows empty cells for days without trades, they are stored as 0
+    price_columns = ['last_trade_price', 'max_price', 'min_price']
+    recent[price_columns] = recent[price_columns].replace(0, np.nan)
+
+    close = recent.pivot(index='date', columns='code', values='last_trade_price').ffill()
+    indicators = screener_indicators(close.to_numpy())
+
+    # Sorted by code and date, so the last row per code is its latest trading day
+    screen = recent.drop_duplicates('code', keep='last').set_index('code')
+    screen['last_trade_price'] = close.iloc[-1]
+    for name in SCREENER_INDICATORS:
+        screen[name] = pd.Series(indicators[name][-1], index=close.columns)
+    screen = screen.reset_index()[['code', 'date', *SCREENER_FIELDS]]
+
+    for field, (minimum, maximum) in (filters or {}).items():
+        if minimum is not None:
+            screen = screen[screen[field] >= minimum]
+        if maximum is not None:
+            screen = screen[screen[field] <= maximum]
+
+    screen = screen.sort_values(sort_by, ascending=not descending, na_position='last')
+    if limit is not None:
+        screen = screen.head(limit)
+
+    screen['date'] = screen['date'].dt.strftime('%Y-%m-%d')
+    return screen.astype(object).where(screen.notna(), None).to_dict('records')
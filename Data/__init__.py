@@ -1,2 +1,11 @@
-from .db_functions import add_company,insert_company_data,get_companies_by_code,get_company_data_by_code,get_last_update_for_all_companies,get_connection
-from .instantiate_db import get_connection
\ No newline at end of file
+from Metrics.startup import lazy_exports
+
+# Loaded on first access, so importing Data.engine doesn't pull in the whole data layer
+__getattr__ = lazy_exports(__name__, {
+    'add_company': '.db_functions',
+    'insert_company_data': '.db_functions',
+    'get_companies_by_code': '.db_functions',
+    'get_company_data_by_code': '.db_functions',
+    'get_last_update_for_all_companies': '.db_functions',
+    'get_connection': '.instantiate_db',
+})
@@ -0,0 +1,195 @@
+"""
+Parquet archive of the price history, one file per company and year:
+
+    Data/archive/code=ALKB/year=2024/part-0.parquet
+
+Analysts load the whole market from here (see Classifiers.market_data) instead of
+querying AllCompaniesData company by company. Values are stored as in the
+database, 0 where the site showed an empty cell.
+
+sync_archive() only rewrites the partitions whose rows changed since the last
+sync: the companies whose data version moved are fingerprinted per year (row
+count, last date and column totals) and compared with the fingerprints kept in
+_sync_state.json. main.py syncs after every scrape run.
+
+Usage:
+    python -m Data.archive [--db path/to/database.db] [--out path/to/archive] [--full]
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+from sqlalchemy import text, bindparam
+
+from Data.db_functions import FRAME_COLUMNS, _read_company_frame
+from Data.engine import DB_PATH, create_sqlite_engine, get_engine
+
+ARCHIVE_PATH = os.environ.get('ARCHIVE_PATH', os.path.join(os.path.dirname(__file__), 'archive'))
+
+# Kept next to the partitions; names starting with '_' or '.' are skipped by Parquet readers
+STATE_FILE = '_sync_state.json'
+PARTITION_FILE = 'part-0.parquet'
+
+# A full-market read opens every partition, so the files favour cheap decoding over
+# the last bit of size: snappy, plain encoding, statistics only for date filters
+PARQUET_OPTIONS = {'compression': 'snappy', 'use_dictionary': False, 'write_statistics': ['date']}
+
+
+def partition_dir(path, code, year):
+    return os.path.join(path, f"code={code}", f"year={year}")
+
+
+def _read_state(path):
+    try:
+        with open(os.path.join(path, STATE_FILE)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {'versions': {}, 'partitions': {}}
+
+
+def _write_state(path, state):
+    temporary = os.path.join(path, f".{STATE_FILE}.tmp")
+    with open(temporary, 'w') as file:
+        json.dump(state, file)
+    os.replace(temporary, os.path.join(path, STATE_FILE))
+
+
+def _data_versions(connection):
+    return dict(connection.execute(text("SELECT code, version FROM data_versions")).fetchall())
+
+
+def _fingerprints(connection, codes=None):
+    """
+        Returns {'CODE/YEAR': [rows, last date, column totals...]} for the given
+        codes, or for every company when codes is None.
+    """
+    totals = ', '.join(f"TOTAL({column})" for column in FRAME_COLUMNS)
+    where = "AND code IN :codes" if codes is not None else ""
+    query = text(f"""
+        SELECT code, strftime('%Y', date) AS year, COUNT(*), MAX(date), {totals}
+        FROM AllCompaniesData
+        WHERE date IS NOT NULL {where}
+        GROUP BY code, year
+    """)
+    if codes is not None:
+        query = query.bindparams(bindparam('codes', expanding=True))
+    rows = connection.execute(query, {'codes': list(codes)} if codes is not None else {}).fetchall()
+    return {f"{code}/{year}": [count, str(last_date), *[round(total, 4) for total in sums]]
+            for code, year, count, last_date, *sums in rows}
+
+
+def _write_partition(path, code, year, frame):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {'date': pa.array(frame.index.date, type=pa.date32())}
+    for column in FRAME_COLUMNS:
+        columns[column] = pa.array(frame[column].to_numpy(), type=pa.float64())
+
+    directory = partition_dir(path, code, year)
+    os.makedirs(directory, exist_ok=True)
+    # Written next to the old file and swapped in, so readers never see half a partition
+    temporary = os.path.join(directory, f".{PARTITION_FILE}.tmp")
+    pq.write_table(pa.table(columns), temporary, **PARQUET_OPTIONS)
+    os.replace(temporary, os.path.join(directory, PARTITION_FILE))
+
+
+def _remove_partition(path, code, year):
+    shutil.rmtree(partition_dir(path, code, year), ignore_errors=True)
+    company_dir = os.path.join(path, f"code={code}")
+    if os.path.isdir(company_dir) and not os.listdir(company_dir):
+        os.rmdir(company_dir)
+
+
+def sync_archive(engine=None, path=ARCHIVE_PATH, full=False):
+    """
+        Brings the Parquet archive at `path` up to date with AllCompaniesData.
+
+        Args:
+            engine: Engine of the database to export, the shared one by default.
+            path (str): Directory of the archive, created if missing.
+            full (bool): Fingerprint every company, not only those with a new data version.
+
+        Returns:
+            dict: Companies checked, partitions written and removed, rows written and
+            seconds taken, or None if the sync failed.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("The Parquet archive needs pyarrow, run: pip install pyarrow")
+        return None
+
+    engine = engine or get_engine()
+    started = time.perf_counter()
+    try:
+        os.makedirs(path, exist_ok=True)
+        state = _read_state(path)
+        full = full or not state['partitions']
+
+        with engine.connect() as connection:
+            # Versions first, so a write that lands during the sync shows up in the next one
+            versions = _data_versions(connection)
+            codes = None if full else sorted(code for code, version in versions.items()
+                                             if state['versions'].get(code) != version)
+            if codes == []:
+                return {'companies': 0, 'written': 0, 'removed': 0, 'rows': 0,
+                        'seconds': time.perf_counter() - started}
+            fingerprints = _fingerprints(connection, codes)
+
+            checked = set(codes) if codes is not None else {key.split('/')[0] for key in fingerprints}
+            old = {key: value for key, value in state['partitions'].items()
+                   if codes is None or key.split('/')[0] in checked}
+            changed = sorted(key for key, value in fingerprints.items() if old.get(key) != value)
+
+            written = rows = 0
+            for code in sorted({key.split('/')[0] for key in changed}):
+                frame = _read_company_frame(connection, code, None, None, FRAME_COLUMNS)
+                years = frame.index.year
+                for key in (key for key in changed if key.split('/')[0] == code):
+                    year = int(key.split('/')[1])
+                    part = frame[years == year]
+                    _write_partition(path, code, year, part)
+                    state['partitions'][key] = fingerprints[key]
+                    written += 1
+                    rows += len(part)
+
+        removed = 0
+        for key in sorted(set(old) - set(fingerprints)):
+            code, year = key.split('/')
+            _remove_partition(path, code, year)
+            del state['partitions'][key]
+            removed += 1
+
+        state['versions'].update({code: version for code, version in versions.items()
+                                  if codes is None or code in checked})
+        _write_state(path, state)
+        return {'companies': len(checked), 'written': written, 'removed': removed, 'rows': rows,
+                'seconds': time.perf_counter() - started}
+    except Exception as e:
+        print(f"An error occurred while syncing the archive: {e}")
+        return None
+
+
+def archive_size(path=ARCHIVE_PATH):
+    """
+        Total bytes of the Parquet files in the archive.
+    """
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names if name.endswith('.parquet'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the price history to a partitioned Parquet archive.")
+    parser.add_argument('--db', default=DB_PATH, help="Path to the SQLite database file.")
+    parser.add_argument('--out', default=ARCHIVE_PATH, help="Directory of the archive.")
+    parser.add_argument('--full', action='store_true', help="Check every company, not only the changed ones.")
+    args = parser.parse_args()
+
+    result = sync_archive(create_sqlite_engine(args.db), args.out, args.full)
+    if result is not None:
+        print(f"Checked {result['companies']} companies: {result['written']} partitions written "
+              f"({result['rows']} rows), {result['removed']} removed in {result['seconds']:.2f}s. "
+              f"Archive is {archive_size(args.out) / 1e6:.1f} MB.")
@@ -1,23 +1,79 @@
 # Data/CompanyData_methods.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from Data.instantiate_db import  get_connection
+import Data.engine as database
 from Models.CompanyData import CompanyData
 from Models.Company import Company
-from datetime import datetime
-from sqlalchemy import text
+from Models.WeeklyBar import WeeklyBar
+from Models.MonthlyBar import MonthlyBar
+from Models.DataVersion import DataVersion
+from Models.FetchCheckpoint import FetchCheckpoint
+from datetime import datetime, date, timedelta
+from sqlalchemy import text, select, type_coerce, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Columns overwritten when a scraped (code, date) row already exists
+UPSERT_COLUMNS = ['last_trade_price', 'max_price', 'min_price', 'avg_price', 'percent_change',
+                  'volume', 'turnover_best_denars', 'total_turnover_denars']
+
+# Value columns returned by get_company_frame by default
+FRAME_COLUMNS = UPSERT_COLUMNS
+
+# Value columns returned by get_price_matrix by default
+MATRIX_COLUMNS = ['last_trade_price', 'max_price', 'min_price', 'volume']
+
+# How daily rows are rolled up into weekly and monthly bars
+BAR_AGGREGATIONS = {
+    'last_trade_price': 'mean',
+    'volume': 'sum',
+    'percent_change': 'mean',
+    'max_price': 'max',
+    'min_price': 'min',
+}
+
+# Timeframe -> (rollup model, pandas resample frequency). Spelled out as week ending
+# Sunday and month end, the 'M' alias is deprecated since pandas 2.2
+ROLLUP_TABLES = {
+    'W': (WeeklyBar, 'W-SUN'),
+    'M': (MonthlyBar, 'ME'),
+}
+
+
+# Callbacks taking a company code, called after new data for it is committed
+_data_listeners = []
+
+
+def add_data_listener(callback):
+    """
+        Registers a callback(code) that is called whenever data for a company changes
+        in this process, e.g. to invalidate cached analyses.
+    """
+    _data_listeners.append(callback)
 
-import os
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "database.db")
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+def _notify_data_changed(codes):
+    for code in codes:
+        for callback in _data_listeners:
+            callback(code)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
 
+def _bump_data_versions(connection, codes):
+    statement = sqlite_insert(DataVersion.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['code'],
+        set_={'version': DataVersion.__table__.c.version + 1}
+    )
+    connection.execute(statement, [{'code': code, 'version': 1} for code in codes])
 
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+
+def get_data_version(code: str):
+    """
+        Returns the data version of a company, 0 if nothing was written for it yet.
+        The version changes with every write, also from other processes.
+    """
+    with database.engine.connect() as connection:
+        version = connection.execute(
+            select(DataVersion.__table__.c.version).where(DataVersion.__table__.c.code == code)
+        ).scalar()
+    return version or 0
 
 
 def get_all_company_codes():
@@ -27,7 +83,7 @@ def get_all_company_codes():
     Returns:
         list: A list of company codes as strings.
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
         # Assuming the `Company` table has a column named `code`
         codes = session.query(Company.code).all()
@@ -49,7 +105,7 @@ def insert_company_data(code: str, date: str, last_trade_price: float,
         Takes all the arguments from the CompanyData object and creates the object
     """
 
-    session = SessionLocal()
+    session = database.SessionLocal()
     new_company_data = CompanyData(
         code=code,
         date=date,
@@ -81,7 +137,7 @@ def insert_company_data_object(company_record :CompanyData):
         Takes an object from the class CompanyData
     """
 
-    session = SessionLocal()
+    session = database.SessionLocal()
 
     try:
         session.add(company_record)
@@ -93,12 +149,159 @@ def insert_company_data_object(company_record :CompanyData):
     finally:
         session.close()
 
+
+def insert_company_data_bulk(rows, checkpoints=None):
+    """
+        Upserts many company data records in a single transaction.
+
+        Takes a list of dicts keyed by the CompanyData column names (date as a
+        datetime.date, prices as floats) and writes them
+        with one executemany of INSERT ... ON CONFLICT (code, date) DO UPDATE, so
+        overlapping windows and re-scrapes update the existing rows instead of
+        adding duplicates.
+
+        checkpoints is an optional list of dicts keyed by the FetchCheckpoint column
+        names, one per fetched window. They are written in the same transaction, so
+        a window counts as done only if its rows made it to disk.
+
+        Returns:
+            int: The number of rows written, 0 if there was nothing to write, or None
+            if the transaction was rolled back.
+    """
+    if not rows and not checkpoints:
+        return 0
+
+    statement = sqlite_insert(CompanyData.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['code', 'date'],
+        set_={column: statement.excluded[column] for column in UPSERT_COLUMNS}
+    )
+
+    try:
+        with database.engine.begin() as connection:
+            dates_by_code = {}
+            if rows:
+                connection.execute(statement, rows)
+
+                # Keep the weekly/monthly rollups in step, in the same transaction
+                for row in rows:
+                    dates_by_code.setdefault(row['code'], []).append(row['date'])
+                for code, dates in dates_by_code.items():
+                    refresh_rollups(connection, code, min(dates), max(dates))
+                _bump_data_versions(connection, list(dates_by_code))
+
+            if checkpoints:
+                checkpoint_statement = sqlite_insert(FetchCheckpoint.__table__)
+                checkpoint_statement = checkpoint_statement.on_conflict_do_update(
+                    index_elements=['code', 'window_start', 'window_end'],
+                    set_={column: checkpoint_statement.excluded[column] for column in ('rows', 'completed_at')}
+                )
+                connection.execute(checkpoint_statement, checkpoints)
+        _notify_data_changed(dates_by_code)
+        return len(rows)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+
+def get_fetch_checkpoints():
+    """
+        Retrieves the windows that were fetched completely.
+
+        Returns:
+            dict: Company code -> list of (window_start, window_end, completed_at) tuples,
+            the window bounds as datetime.date.
+    """
+    table = FetchCheckpoint.__table__
+    with database.engine.connect() as connection:
+        result = connection.execute(select(table.c.code, table.c.window_start, table.c.window_end,
+                                           table.c.completed_at))
+        checkpoints = {}
+        for code, window_start, window_end, completed_at in result:
+            checkpoints.setdefault(code, []).append((window_start, window_end, completed_at))
+    return checkpoints
+
+
+def _period_bounds(timeframe, start, end):
+    """
+        Widens [start, end] to whole periods: Monday-Sunday weeks or calendar months.
+    """
+    if timeframe == 'W':
+        return start - timedelta(days=start.weekday()), end + timedelta(days=6 - end.weekday())
+    next_month = date(end.year + end.month // 12, end.month % 12 + 1, 1)
+    return date(start.year, start.month, 1), next_month - timedelta(days=1)
+
+
+def refresh_rollups(connection, code, start, end):
+    """
+        Recomputes the weekly and monthly bars of one company for every period
+        touched by the dates start..end, from the daily rows in AllCompaniesData.
+
+        Uses the same df.resample(...).agg(BAR_AGGREGATIONS) as prepare_data, so the
+        stored bars match it exactly. Runs on the caller's connection/transaction.
+    """
+    import numpy as np
+    for timeframe, (model, frequency) in ROLLUP_TABLES.items():
+        period_start, period_end = _period_bounds(timeframe, start, end)
+        daily = _read_company_frame(connection, code, period_start, period_end, list(BAR_AGGREGATIONS))
+        if daily.empty:
+            continue
+
+        # The site shows empty cells for days without trades, they are stored as 0
+        bars = daily.replace(0, np.nan).resample(frequency).agg(BAR_AGGREGATIONS)
+        bars = bars.astype(object).where(bars.notna(), None)
+        records = [dict(record, code=code, period=period.date())
+                   for period, record in zip(bars.index, bars.to_dict('records'))]
+
+        statement = sqlite_insert(model.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['code', 'period'],
+            set_={column: statement.excluded[column] for column in BAR_AGGREGATIONS}
+        )
+        connection.execute(statement, records)
+
+
+def get_rollup_frame(code: str, timeframe: str):
+    """
+        Reads the precomputed weekly ('W') or monthly ('M') bars of a company.
+
+        Returns the same frame as prepare_data's weekly/monthly output: one row per
+        period from the first to the last traded one, forward filled.
+    """
+    import numpy as np
+    import pandas as pd
+    model, frequency = ROLLUP_TABLES[timeframe]
+    table = model.__table__
+    query = select(type_coerce(table.c.period, String), *[table.c[column] for column in BAR_AGGREGATIONS]) \
+        .where(table.c.code == code) \
+        .order_by(table.c.period)
+
+    with database.engine.connect() as connection:
+        rows = connection.execute(query).fetchall()
+
+    if not rows:
+        return pd.DataFrame(columns=list(BAR_AGGREGATIONS), index=pd.DatetimeIndex([], name='date'), dtype=np.float64)
+
+    values = list(zip(*rows))
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(values[0], dtype=object), format='%Y-%m-%d'), name='date')
+    bars = pd.DataFrame(
+        {column: np.asarray(values[i + 1], dtype=np.float64) for i, column in enumerate(BAR_AGGREGATIONS)},
+        index=index
+    )
+
+    # Periods without any daily rows are not stored, resample would give them a 0 volume
+    full_index = pd.date_range(index[0], index[-1], freq=frequency, name='date')
+    missing = full_index.difference(index)
+    bars = bars.reindex(full_index)
+    bars.loc[missing, 'volume'] = 0.0
+    return bars.ffill()
+
 def add_company(code, last_update):
     """
         Takes 2 arguments as strings to create the Company object
         Inserts a company into the database.
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
         new_company = Company(code= code, last_update=last_update)
 
@@ -117,7 +320,7 @@ def add_company_object(company : Company):
         Takes Company object as argument
         Inserts a company into the database.
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
 
         session.add(company)
@@ -130,15 +333,24 @@ def add_company_object(company : Company):
         session.close()
 
 
-def get_company_data_by_code(code: str):
+def get_company_data_by_code(code: str, start=None, end=None):
     """
         Takes a string as an argument and retrives all the company records with the company code
-        Retrieve all companies from the database with the specified code.
+        Retrieve all companies from the database with the specified code, ordered by date.
+
+        Args:
+            start (datetime.date): Optional first date to include.
+            end (datetime.date): Optional last date to include.
         """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
-        company_data = session.query(CompanyData).filter(CompanyData.code == code).all()
-        #ompany_data.sort(key=lambda x: datetime.strptime(x.date.replace(".","-") or datetime.min, '%d-%m-%Y'))
+        # (code, date) is indexed, so a date range is an index seek
+        query = session.query(CompanyData).filter(CompanyData.code == code)
+        if start is not None:
+            query = query.filter(CompanyData.date >= start)
+        if end is not None:
+            query = query.filter(CompanyData.date <= end)
+        company_data = query.order_by(CompanyData.date).all()
         return company_data
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -146,12 +358,133 @@ def get_company_data_by_code(code: str):
     finally:
         session.close()
 
+def _read_company_frame(connection, code, start, end, columns):
+    import numpy as np
+    import pandas as pd
+    table = CompanyData.__table__
+    # Read the ISO date as plain text so it is converted for the whole column at once
+    query = select(type_coerce(table.c.date, String), *[table.c[column] for column in columns]) \
+        .where(table.c.code == code, table.c.date.isnot(None))
+    if start is not None:
+        query = query.where(table.c.date >= start)
+    if end is not None:
+        query = query.where(table.c.date <= end)
+    query = query.order_by(table.c.date)
+
+    rows = connection.execute(query).fetchall()
+    values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(values[0], dtype=object), format='%Y-%m-%d'), name='date')
+    return pd.DataFrame(
+        {column: np.asarray(values[i + 1], dtype=np.float64) for i, column in enumerate(columns)},
+        index=index
+    )
+
+def get_company_frame(code: str, start=None, end=None, columns=FRAME_COLUMNS):
+    """
+        Reads the history of one company straight into a DataFrame, without ORM objects.
+
+        Runs a Core select and builds one typed NumPy column per field from the cursor,
+        dates are parsed once for the whole column.
+
+        Args:
+            code (str): The company code.
+            start (datetime.date): Optional first date to include.
+            end (datetime.date): Optional last date to include.
+            columns (list): CompanyData value columns to load.
+
+        Returns:
+            DataFrame: float64 columns indexed by a DatetimeIndex named 'date', sorted by date.
+    """
+    with database.engine.connect() as connection:
+        return _read_company_frame(connection, code, start, end, columns)
+
+def get_price_matrix(columns=MATRIX_COLUMNS, start=None, end=None):
+    """
+        Reads the history of every company with one query and pivots it into one
+        (date x code) DataFrame per column, NaN where a company has no row that day.
+
+        Args:
+            columns (list): CompanyData value columns to load.
+            start (datetime.date): Optional first date to include.
+            end (datetime.date): Optional last date to include.
+
+        Returns:
+            dict: Column name -> DataFrame indexed by date with one column per code.
+    """
+    import numpy as np
+    import pandas as pd
+    table = CompanyData.__table__
+    query = select(table.c.code, type_coerce(table.c.date, String), *[table.c[column] for column in columns]) \
+        .where(table.c.date.isnot(None))
+    if start is not None:
+        query = query.where(table.c.date >= start)
+    if end is not None:
+        query = query.where(table.c.date <= end)
+
+    with database.engine.connect() as connection:
+        rows = connection.execute(query).fetchall()
+
+    long = pd.DataFrame(rows, columns=['code', 'date', *columns])
+    long['date'] = pd.to_datetime(long['date'], format='%Y-%m-%d')
+    long[columns] = long[columns].astype(np.float64)
+    return {column: long.pivot(index='date', columns='code', values=column) for column in columns}
+
+def get_recent_company_data(days: int, columns=FRAME_COLUMNS):
+    """
+        Reads the last `days` calendar days of every company, counted back from each
+        company's own latest row, in one grouped query.
+
+        Returns:
+            DataFrame: Long frame with 'code', 'date' and the value columns, sorted by code and date.
+    """
+    import numpy as np
+    import pandas as pd
+    value_columns = ', '.join(f"d.{column}" for column in columns)
+    query = text(f"""
+        SELECT d.code, d.date, {value_columns}
+        FROM AllCompaniesData d
+        JOIN (SELECT code, MAX(date) AS last_date FROM AllCompaniesData GROUP BY code) latest
+            ON d.code = latest.code
+        WHERE d.date > date(latest.last_date, :lookback)
+        ORDER BY d.code, d.date
+    """)
+
+    with database.engine.connect() as connection:
+        rows = connection.execute(query, {'lookback': f"-{int(days)} days"}).fetchall()
+
+    recent = pd.DataFrame(rows, columns=['code', 'date', *columns])
+    recent['date'] = pd.to_datetime(recent['date'], format='%Y-%m-%d')
+    recent[columns] = recent[columns].astype(np.float64)
+    return recent
+
+def get_trading_dates_by_code():
+    """
+        Retrieves the stored trading dates of every company.
+
+        Returns:
+            dict: Company code -> sorted list of datetime.date.
+    """
+    session = database.SessionLocal()
+    try:
+        dates_by_code = {}
+        query = session.query(CompanyData.code, CompanyData.date) \
+            .filter(CompanyData.date.isnot(None)) \
+            .order_by(CompanyData.code, CompanyData.date)
+        for code, trading_date in query:
+            dates_by_code.setdefault(code, []).append(trading_date)
+        return dates_by_code
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+    finally:
+        session.close()
+
 def get_last_update_for_all_companies():
     """
         Retrieves the last update for each Company in the database as a list of tuples.
         Each tuple contains (code, last_update).
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
         companies = session.query(Company.code, Company.last_update).all()
         return companies
@@ -167,7 +500,7 @@ def get_companies_by_code(code: str):
         Retrieves all Company objects with the specified code.
         Returns a list of Company objects.
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
         companies = session.query(Company).filter(Company.code == code).all()
         return companies
@@ -185,7 +518,7 @@ def update_last_update_by_code(code: str, new_last_update: str):
             code (str): The company code to identify the record.
             new_last_update (datetime): The new value for the last_update field.
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
         company = session.query(Company).filter(Company.code == code).first()
         if not company:
@@ -193,7 +526,9 @@ def update_last_update_by_code(code: str, new_last_update: str):
             return False
 
         company.last_update = new_last_update
+        _bump_data_versions(session.connection(), [code])
         session.commit()
+        _notify_data_changed([code])
         print(f"Updated last_update for company with code {code}.")
         return True
     except Exception as e:
@@ -213,7 +548,7 @@ def delete_companies_by_code(code: str):
         Returns:
             bool: True if deletion is successful, False otherwise.
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
         # Find and delete all companies with the specified code
         deleted_count = session.query(CompanyData).filter(Company.code == code).delete()
@@ -240,7 +575,7 @@ def delete_data_for_unfinished_companies():
     Returns:
         bool: True if deletion is successful, False otherwise.
     """
-    session = SessionLocal()
+    session = database.SessionLocal()
     try:
         # Identify companies that haven't finished loading
         unfinished_companies = session.query(Company).filter(Company.last_update == 'None').all()
@@ -0,0 +1,82 @@
+"""
+Shared SQLite engine and sessions.
+
+Every module talks to the database through the engine created here, so the app,
+the scraper and the migrations all use the same file and the same connection
+settings. The file defaults to Data/database.db and can be moved with the
+DATABASE_PATH environment variable. Scraped rows are written by the single writer
+thread of PipeFilterSystem.ingestion.IngestionStage.
+
+The engine and SessionLocal are created the first time they are used, so importing
+the data layer doesn't touch the database.
+"""
+import os
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+DB_PATH = os.environ.get('DATABASE_PATH', os.path.join(os.path.dirname(__file__), "database.db"))
+
+# Applied to every new connection. WAL lets the dashboard read while the scraper
+# writes, busy_timeout makes a writer wait for the lock instead of failing with
+# "database is locked", and NORMAL sync is safe in WAL mode (only the last
+# transactions can be lost on power failure, the file can't be corrupted).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 30000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative means KiB, 64 MiB
+    'temp_store': 'MEMORY',
+}
+
+
+def create_sqlite_engine(path=DB_PATH, pragmas=SQLITE_PRAGMAS):
+    """
+        Creates an engine for a SQLite file with the pragmas applied on connect.
+        Connections may be used from any thread, the pool hands each one out to one thread at a time.
+    """
+    new_engine = create_engine(f"sqlite:///{path}", connect_args={'check_same_thread': False})
+
+    @event.listens_for(new_engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return new_engine
+
+
+_engine_lock = threading.Lock()
+
+
+def set_engine(new_engine):
+    """
+        Makes `new_engine` the shared engine, e.g. one on a temporary file in a benchmark.
+    """
+    global engine, SessionLocal
+    engine = new_engine
+    # One session per thread, so scraper threads never share a session
+    SessionLocal = scoped_session(sessionmaker(bind=new_engine))
+    return new_engine
+
+
+def get_engine():
+    """
+        Returns the shared engine, created on first use.
+    """
+    with _engine_lock:
+        if 'engine' not in globals():
+            set_engine(create_sqlite_engine())
+        return globals()['engine']
+
+
+def __getattr__(name):
+    # Data.engine.engine and Data.engine.SessionLocal only exist once get_engine() ran
+    if name in ('engine', 'SessionLocal'):
+        get_engine()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
@@ -1,23 +1,12 @@
 import os
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import inspect
 from sqlalchemy import text
 
 # Define the Base for ORM models
 from Models.models_base import Base
 
-
-# Define the database file path
-
-DB_PATH = 'database.db'
-DATABASE_URL = f"sqlite:///{DB_PATH}"
-
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)  # Set echo=False in production
-
-# Create a session factory
-SessionLocal = sessionmaker(bind=engine)
+# The engine and session factory are shared with db_functions, see Data/engine.py
+import Data.engine as database
 
 def get_connection():
     """
@@ -28,14 +17,14 @@ def get_connection():
         with get_connection() as session:
             # Perform database operations
     """
-    db = SessionLocal()
+    db = database.SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        database.SessionLocal.remove()
 
 def create_tables():
-    with engine.connect() as connection:
+    with database.engine.connect() as connection:
         # Step 1: Create a new table with the foreign key
         connection.execute(
             text("""
@@ -76,7 +65,7 @@ def create_tables():
 
 
 if __name__ == "__main__":
-    Base.metadata.create_all(engine)
+    Base.metadata.create_all(database.get_engine())
 
     # inspector = inspect(engine)
     # tables = inspector.get_table_names()
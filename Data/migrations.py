@@ -0,0 +1,160 @@
+"""
+One-shot schema migrations for an existing database.db.
+
+Usage:
+    python -m Data.migrations dedupe [--db path/to/database.db]
+    python -m Data.migrations native-types [--db path/to/database.db]
+    python -m Data.migrations rollups [--db path/to/database.db]
+    python -m Data.migrations upgrade [--db path/to/database.db]
+"""
+import argparse
+from datetime import date, datetime
+
+from sqlalchemy import inspect, text
+
+from Data.db_functions import refresh_rollups
+from Data.engine import DB_PATH, create_sqlite_engine
+from Models.CompanyData import CompanyData
+from Models.models_base import Base
+
+PRICE_COLUMNS = ['last_trade_price', 'max_price', 'min_price', 'avg_price', 'percent_change',
+                 'volume', 'turnover_best_denars', 'total_turnover_denars']
+
+
+def normalize_date(date_str):
+    """
+        Returns the date in zero padded '%d.%m.%Y' form, the site sometimes omits the padding ('02.1.2020').
+    """
+    try:
+        return datetime.strptime(date_str, '%d.%m.%Y').strftime('%d.%m.%Y')
+    except (TypeError, ValueError):
+        return date_str
+
+
+def dedupe_company_data(engine):
+    """
+        Removes duplicate (code, date) rows from AllCompaniesData, keeping the most
+        recently inserted one, and adds the unique (code, date) index.
+
+        Dates are normalized to the zero padded form first so that '02.1.2020' and
+        '02.01.2020' count as the same day.
+
+        Returns:
+            int: The number of deleted rows.
+    """
+    with engine.begin() as connection:
+        if not inspect(connection).has_table('AllCompaniesData'):
+            Base.metadata.create_all(connection)
+            return 0
+
+        rows = connection.execute(text("SELECT id, date FROM AllCompaniesData")).fetchall()
+        changed = [{'id': row_id, 'date': normalize_date(date)}
+                   for row_id, date in rows if normalize_date(date) != date]
+        if changed:
+            connection.execute(text("UPDATE AllCompaniesData SET date = :date WHERE id = :id"), changed)
+
+        deleted = connection.execute(text("""
+            DELETE FROM AllCompaniesData
+            WHERE id NOT IN (SELECT MAX(id) FROM AllCompaniesData GROUP BY code, date)
+        """)).rowcount
+
+        connection.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_company_data_code_date
+            ON AllCompaniesData (code, date)
+        """))
+    return deleted
+
+
+def convert_native_types(engine):
+    """
+        Rebuilds AllCompaniesData with ISO 'YYYY-MM-DD' DATE and REAL price columns.
+
+        Older databases store dates as 'dd.mm.yyyy' strings and prices as DECIMAL, which
+        can't be range-queried or read without parsing every row. Expects the dates to be
+        normalized by dedupe_company_data; rows with an unparseable date are dropped.
+
+        Returns:
+            bool: True if the table was converted, False if it already had the native types.
+    """
+    with engine.begin() as connection:
+        columns = {column['name']: column for column in inspect(connection).get_columns('AllCompaniesData')}
+        if str(columns['date']['type']).upper() == 'DATE':
+            return False
+
+        connection.execute(text("DROP INDEX IF EXISTS ix_company_data_code_date"))
+        connection.execute(text("ALTER TABLE AllCompaniesData RENAME TO AllCompaniesData_old"))
+        CompanyData.__table__.create(connection)
+
+        prices = ', '.join(PRICE_COLUMNS)
+        casts = ', '.join(f"CAST({column} AS REAL)" for column in PRICE_COLUMNS)
+        connection.execute(text(f"""
+            INSERT INTO AllCompaniesData (id, code, date, {prices})
+            SELECT id, code, substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2), {casts}
+            FROM AllCompaniesData_old
+            WHERE date GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'
+        """))
+        connection.execute(text("DROP TABLE AllCompaniesData_old"))
+    return True
+
+
+def build_rollups(engine):
+    """
+        Rebuilds weekly_bars and monthly_bars from the whole history of every company.
+
+        Returns:
+            int: The number of companies rolled up.
+    """
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        ranges = connection.execute(text("""
+            SELECT code, MIN(date), MAX(date) FROM AllCompaniesData
+            WHERE date IS NOT NULL GROUP BY code
+        """)).fetchall()
+        for code, start, end in ranges:
+            refresh_rollups(connection, code, date.fromisoformat(start), date.fromisoformat(end))
+    return len(ranges)
+
+
+def upgrade(engine):
+    """
+        Brings the database up to the current schema, safe to run on every start.
+    """
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        has_table = inspector.has_table('AllCompaniesData')
+        indexes = {index['name'] for index in inspector.get_indexes('AllCompaniesData')} if has_table else set()
+
+    if not has_table:
+        Base.metadata.create_all(engine)
+        return
+
+    if 'ix_company_data_code_date' not in indexes:
+        deleted = dedupe_company_data(engine)
+        print(f"Removed {deleted} duplicate company data records.")
+    if convert_native_types(engine):
+        print("Converted company data to native date and numeric columns.")
+    Base.metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        needs_rollups = connection.execute(text("SELECT NOT EXISTS (SELECT 1 FROM monthly_bars)")).scalar() \
+            and connection.execute(text("SELECT EXISTS (SELECT 1 FROM AllCompaniesData)")).scalar()
+    if needs_rollups:
+        print(f"Built weekly and monthly bars for {build_rollups(engine)} companies.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate an existing BrokerBot database.")
+    parser.add_argument('command', choices=['dedupe', 'native-types', 'rollups', 'upgrade'])
+    parser.add_argument('--db', default=DB_PATH, help="Path to the SQLite database file.")
+    args = parser.parse_args()
+
+    target = create_sqlite_engine(args.db)
+    if args.command == 'dedupe':
+        print(f"Removed {dedupe_company_data(target)} duplicate company data records from {args.db}.")
+    elif args.command == 'native-types':
+        dedupe_company_data(target)
+        print("Converted." if convert_native_types(target) else "Already converted.")
+    elif args.command == 'rollups':
+        print(f"Built weekly and monthly bars for {build_rollups(target)} companies.")
+    else:
+        upgrade(target)
@@ -0,0 +1 @@
+from .registry import metrics, MetricsRegistry, to_prometheus, run_summary_snapshot, write_run_summary, read_run_summary
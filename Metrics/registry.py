@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Where the scraper writes the summary of its last run, read by the app's /metrics
+RUN_SUMMARY_PATH = os.environ.get('RUN_SUMMARY_PATH',
+                                  os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Data', 'last_run.json'))
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return '{' + pairs + '}'
+
+
+class MetricsRegistry:
+    """
+        Thread-safe counters, gauges and timers, keyed by name and labels.
+
+        Timers keep a count, total and maximum, which is what Prometheus calls a
+        summary without quantiles.
+
+        Example usage:
+            metrics.increment('scraper_timeouts_total', engine='selenium')
+            with metrics.timer('scraper_page_load_seconds', engine='selenium'):
+                driver.get(url)
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            count, total, maximum = self._timers.get(key, (0, 0.0, 0.0))
+            self._timers[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def total(self, name):
+        """
+            Sum of a counter over all its labels.
+        """
+        with self._lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timers.clear()
+
+    def snapshot(self):
+        """
+            All values as JSON friendly lists of {'name', 'labels', ...} dicts.
+        """
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self._counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self._gauges.items())],
+                'timers': [{'name': name, 'labels': dict(labels), 'count': count, 'sum': total, 'max': maximum}
+                           for (name, labels), (count, total, maximum) in sorted(self._timers.items())],
+            }
+
+
+def to_prometheus(snapshot, prefix='mse_'):
+    """
+        Renders a MetricsRegistry snapshot in the Prometheus text exposition format.
+    """
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for counter in snapshot.get('counters', []):
+        name = prefix + counter['name']
+        declare(name, 'counter')
+        lines.append(f"{name}{_format_labels(sorted(counter['labels'].items()))} {counter['value']}")
+    for gauge in snapshot.get('gauges', []):
+        name = prefix + gauge['name']
+        declare(name, 'gauge')
+        lines.append(f"{name}{_format_labels(sorted(gauge['labels'].items()))} {gauge['value']}")
+    timers = snapshot.get('timers', [])
+    for timer in timers:
+        name = prefix + timer['name']
+        labels = _format_labels(sorted(timer['labels'].items()))
+        declare(name, 'summary')
+        lines.append(f"{name}_count{labels} {timer['count']}")
+        lines.append(f"{name}_sum{labels} {timer['sum']}")
+    # The samples of one metric have to be together, so the maxima come after all summaries
+    for timer in timers:
+        name = f"{prefix}{timer['name']}_max"
+        declare(name, 'gauge')
+        lines.append(f"{name}{_format_labels(sorted(timer['labels'].items()))} {timer['max']}")
+    return '\n'.join(lines) + '\n'
+
+
+def run_summary_snapshot(summary):
+    """
+        Turns a run summary into a snapshot of last_run_* gauges plus the metrics
+        the run recorded, ready for to_prometheus.
+    """
+    snapshot = summary.get('metrics') or {}
+    gauges = list(snapshot.get('gauges', []))
+    for field in ('duration_seconds', 'rows_written', 'rows_per_second', 'companies_loaded',
+                  'first_company_seconds', 'finished_timestamp'):
+        if summary.get(field) is not None:
+            gauges.append({'name': f'last_run_{field}', 'labels': {}, 'value': summary[field]})
+    for stage, stats in (summary.get('stages') or {}).items():
+        for field in ('processed', 'emitted', 'errors', 'busy_time'):
+            gauges.append({'name': f'pipeline_stage_{field}', 'labels': {'stage': stage}, 'value': stats[field]})
+    for field, value in (summary.get('scheduler') or {}).items():
+        gauges.append({'name': f'fetch_scheduler_{field}', 'labels': {}, 'value': value})
+    gauges.sort(key=lambda gauge: (gauge['name'], sorted(gauge['labels'].items())))
+    return {**snapshot, 'gauges': gauges}
+
+
+def write_run_summary(summary, path=RUN_SUMMARY_PATH):
+    """
+        Writes the summary of a scrape run as JSON, replacing the previous one atomically.
+    """
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, 'w') as file:
+            json.dump(summary, file, indent=2, default=str)
+        os.replace(temporary, path)
+        return True
+    except OSError as e:
+        print(f"Could not write the run summary: {e}")
+        return False
+
+
+def read_run_summary(path=RUN_SUMMARY_PATH):
+    """
+        Returns the summary of the last scrape run, None if there was none.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+# Process wide registry used by the scraper and the app
+metrics = MetricsRegistry()
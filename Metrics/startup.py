@@ -0,0 +1,70 @@
+import importlib
+import os
+import sys
+
+# What the scraper (main.py) and the dashboard (app/server.py) import when they start
+STARTUP_MODULES = ('PipeFilterSystem', 'Data.migrations', 'app.server')
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def lazy_exports(package, exports):
+    """
+        Returns a module __getattr__ for `package` that imports each name in `exports`
+        (name -> relative module) the first time it is accessed, so importing the
+        package doesn't import its heavy modules.
+
+        Example usage, in a package __init__.py:
+            __getattr__ = lazy_exports(__name__, {'screen_market': '.screener'})
+    """
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name], package), name)
+        # Set on the package, so later lookups don't come back here
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
+
+
+def profile_imports(module):
+    """
+        Imports `module` in a fresh interpreter with -X importtime and returns
+        (name, self_seconds, cumulative_seconds, depth) for every module it loaded,
+        in import order.
+    """
+    # Imported here, the packages load this module for lazy_exports when they start
+    import subprocess
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [_ROOT, os.environ.get('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ImportError(f"Could not import {module}: {result.stderr.strip().splitlines()[-1]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return imports
+
+
+def print_import_profile(modules=STARTUP_MODULES, top=15):
+    """
+        Prints the total import time of every module and the slowest modules it pulls in.
+    """
+    for module in modules:
+        try:
+            imports = profile_imports(module)
+        except ImportError as e:
+            print(e)
+            continue
+        total = next((cumulative for name, _, cumulative, _ in imports if name == module), 0.0)
+        print(f"\nimport {module}: {total * 1000:.0f} ms, {len(imports)} modules")
+        print(f"  {'cumulative':>10} {'self':>8}  module")
+        for name, self_seconds, cumulative, _ in sorted(imports, key=lambda item: -item[2])[1:top + 1]:
+            print(f"  {cumulative * 1000:8.1f}ms {self_seconds * 1000:6.1f}ms  {name}")
@@ -1,21 +1,23 @@
 from sqlalchemy.orm import declarative_base,relationship
-from sqlalchemy import Column,Integer,String,DateTime,ForeignKey,DECIMAL
+from sqlalchemy import Column,Integer,String,Date,Float,ForeignKey,Index
 
 from Models.models_base import Base
 class CompanyData(Base):
     __tablename__ = 'AllCompaniesData'
+    # One row per company and trading day, re-scrapes update it in place
+    __table_args__ = (Index('ix_company_data_code_date', 'code', 'date', unique=True),)
     # Define columns
     id = Column(Integer, primary_key=True, autoincrement=True)
     code = Column(String, ForeignKey("Companies.code"))
-    date = Column(String)
-    last_trade_price = Column(DECIMAL)
-    max_price = Column(DECIMAL)
-    min_price = Column(DECIMAL)
-    avg_price = Column(DECIMAL)
-    percent_change = Column(DECIMAL)
-    volume = Column(DECIMAL)
-    turnover_best_denars = Column(DECIMAL)
-    total_turnover_denars = Column(DECIMAL)
+    date = Column(Date)
+    last_trade_price = Column(Float)
+    max_price = Column(Float)
+    min_price = Column(Float)
+    avg_price = Column(Float)
+    percent_change = Column(Float)
+    volume = Column(Float)
+    turnover_best_denars = Column(Float)
+    total_turnover_denars = Column(Float)
 
     # Define the relationship back to Company
     company = relationship("Company", back_populates="company_data")
@@ -0,0 +1,16 @@
+from sqlalchemy import Column,Integer,String
+
+from Models.models_base import Base
+
+class DataVersion(Base):
+    """
+        Counter bumped every time new data is written for a company, so readers in
+        other processes (e.g. the dashboard cache) can tell their copy is stale.
+    """
+    __tablename__ = 'data_versions'
+
+    code = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"DataVersion {self.code} {self.version}"
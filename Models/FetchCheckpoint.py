@@ -0,0 +1,20 @@
+from sqlalchemy import Column,Integer,String,Date,DateTime,ForeignKey
+
+from Models.models_base import Base
+
+class FetchCheckpoint(Base):
+    """
+        A (company, date window) the scraper has fetched and written completely.
+        Written in the same transaction as the window's rows, so a window is either
+        stored with its checkpoint or not at all and an interrupted run can resume.
+    """
+    __tablename__ = 'fetch_checkpoints'
+
+    code = Column(String, ForeignKey("Companies.code"), primary_key=True)
+    window_start = Column(Date, primary_key=True)
+    window_end = Column(Date, primary_key=True)
+    rows = Column(Integer, nullable=False, default=0)
+    completed_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"FetchCheckpoint {self.code} {self.window_start}-{self.window_end}"
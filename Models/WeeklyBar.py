@@ -0,0 +1,21 @@
+from sqlalchemy import Column,String,Date,Float,ForeignKey
+
+from Models.models_base import Base
+
+class WeeklyBar(Base):
+    """
+        Weekly rollup of AllCompaniesData, one row per company and period.
+        period is the last day of the period, the label df.resample uses.
+    """
+    __tablename__ = 'weekly_bars'
+
+    code = Column(String, ForeignKey("Companies.code"), primary_key=True)
+    period = Column(Date, primary_key=True)
+    last_trade_price = Column(Float)
+    volume = Column(Float)
+    percent_change = Column(Float)
+    max_price = Column(Float)
+    min_price = Column(Float)
+
+    def __repr__(self):
+        return f"WeeklyBar {self.code} {self.period}"
@@ -1,3 +1,7 @@
 from .Company import Company
 from .CompanyData import CompanyData
-from .models_base import Base
\ No newline at end of file
+from .models_base import Base
+from .WeeklyBar import WeeklyBar
+from .MonthlyBar import MonthlyBar
+from .DataVersion import DataVersion
+from .FetchCheckpoint import FetchCheckpoint
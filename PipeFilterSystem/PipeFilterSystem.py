@@ -1,70 +1,432 @@
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
 from Data.db_functions import get_last_update_for_all_companies, add_company_object, update_last_update_by_code
+from Metrics import metrics, write_run_summary
 from Models import Company
-from Scraper import SeleniumWorker, WebDriverPool
-from Scraper.selenium_scraper import set_driver_options, get_current_date
+from Scraper.fetch_scheduler import FetchScheduler, FetchJob
+from PipeFilterSystem.ingestion import IngestionStage
+from PipeFilterSystem.streaming import Stage, StreamingPipe
+from Scraper.sync_planner import SyncPlanner, MAX_WINDOW_DAYS, ROW_CAP, split_window, parse_date, format_date
+from Scraper.selenium_scraper import SeleniumWorker, set_driver_options, get_current_date, MSE_BASE_URL
+
+ENGINES = ('selenium', 'http')
 
 
 class PipeFilterSystem:
-    def __init__(self, filters):
-        self.pipe = Pipe(filters)
+    def __init__(self, filters, engine='selenium', base_url=MSE_BASE_URL, pool_size=None):
+        self.pipe = Pipe(filters, engine, base_url, pool_size)
 
     def filter_data(self):
         return self.pipe.start_flow()
 
 
 class Filter:
-    def process_data(self, pool_size, webdriver_pool):
+    base_url = MSE_BASE_URL
+
+    def stages(self, pool_size, webdriver_pool):
+        """
+            Returns the pipeline stages this filter contributes, in order.
+        """
         return []
 
+    def close(self):
+        pass
+
+    def create_worker(self, webdriver_pool):
+        from Scraper.http_session_pool import HttpSessionPool
+
+        # The pool type decides which scraper engine is used for this run
+        if isinstance(webdriver_pool, HttpSessionPool):
+            from Scraper.http_scraper import HttpWorker
+            return HttpWorker(webdriver_pool, self.base_url)
+        return SeleniumWorker(webdriver_pool, self.base_url)
+
+
+class RawPage:
+    """
+        History table of one fetched window, as rows of cell texts.
+    """
+
+    def __init__(self, job, table_rows):
+        self.job = job
+        self.table_rows = table_rows
+
+    def __repr__(self):
+        return f"RawPage {self.job.code} {self.job.start_date}-{self.job.end_date}"
+
+
+class ParsedWindow:
+    """
+        Rows of one window ready for insert_company_data_bulk, with their checkpoint.
+    """
+
+    def __init__(self, job, rows, checkpoint):
+        self.job = job
+        self.rows = rows
+        self.checkpoint = checkpoint
+
+    def __repr__(self):
+        return f"ParsedWindow {self.job.code} {self.job.start_date}-{self.job.end_date} ({len(self.rows)} rows)"
+
+
+class CompanyProgress:
+    """
+        Counts the windows of every company that are still on their way through the pipe.
+    """
 
-class CodeFilter(Filter):
     def __init__(self):
+        self._remaining = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def expect(self, code, windows):
+        with self._lock:
+            self._remaining[code] = windows
+
+    def split(self, code, windows=2):
+        # A window replaced by `windows` smaller ones
+        with self._lock:
+            self._remaining[code] += windows - 1
+
+    def window_done(self, code, ok=True):
+        """
+            Returns True once the company's last window is done and none of them failed.
+        """
+        with self._lock:
+            if not ok:
+                self._failed.add(code)
+            self._remaining[code] -= 1
+            return self._remaining[code] == 0 and code not in self._failed
+
+
+class CodeStage(Stage):
+    """
+        Fetches the issuer list when the pipe starts and passes on every code. The
+        list doesn't go through the FetchScheduler, so it is retried here with the
+        same backoff; if it still can't be loaded the whole run fails.
+    """
+    name = 'codes'
+
+    def __init__(self, worker, code_filter, max_retries=3, backoff=1.0):
+        super().__init__()
+        self.worker = worker
+        self.code_filter = code_filter
+        self.max_retries = max_retries
+        self.backoff = backoff
         self.keys = None
 
-    def process_data(self, pool_size, webdriver_pool):
-        key_worker = SeleniumWorker(webdriver_pool)
-        companies = get_last_update_for_all_companies()
-        self.keys = key_worker.fetch_company_keys()
+    def open(self):
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                self.keys = self.worker.fetch_company_keys()
+                if not self.keys:
+                    raise RuntimeError("the issuer list is empty")
+                return
+            except Exception as e:
+                if attempt > self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+                print(f"Fetching the issuer list failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def process(self, base_url):
+        companies = get_last_update_for_all_companies() or []
+        keys = self.keys
 
         if not companies:
             print("No companies found in database, fetching from web...")
-            for key in self.keys:
-                company = Company(key, "None")
-                add_company_object(company)
         else:
             print(str(len(companies)) + " companies found in database")
 
-        for company in companies:
-            if company.last_update == get_current_date():
-                if company.code in self.keys: self.keys.remove(company.code)
+        known_codes = {company.code for company in companies}
+        for key in keys:
+            if key not in known_codes:
+                add_company_object(Company(key, "None"))
+            self.code_filter.keys.append(key)
+            yield key
+
+
+class PlanStage(Stage):
+    name = 'plans'
+
+    def __init__(self, code_filter, host, buffer=256):
+        super().__init__(buffer=buffer)
+        self.code_filter = code_filter
+        self.host = host
+        self.planner = code_filter.planner
+
+    def open(self):
+        if not self.planner.load():
+            raise RuntimeError("no plan without the stored trading dates")
+
+    def process(self, code):
+        # Only issuers with missing trading days are fetched, and only for the missing ranges
+        windows = self.planner.plan_code(code)
+        if not windows:
+            return
+        self.code_filter.plan[code] = windows
+        self.code_filter.progress.expect(code, len(windows))
+        for start_date, end_date in windows:
+            yield FetchJob(code, start_date, end_date, self.host)
+
+    def close(self):
+        print(str(len(self.code_filter.plan)) + " companies are going to be updated...")
+
+
+class FetchStage(Stage):
+    """
+        Fetches the table of every window. A table with row_cap rows or more is taken
+        as cut off by the site, so its window is fetched again as two halves, down to
+        single days if needed.
+
+        A table can also be cut off below row_cap. When its oldest row comes long after
+        the window start for how often the issuer trades, only the span from that row
+        on is passed on, and so checkpointed, and the rest of the window is fetched again.
+    """
+    name = 'pages'
+
+    def __init__(self, scheduler, progress, planner, concurrency, buffer=64, row_cap=ROW_CAP):
+        super().__init__(concurrency, buffer)
+        self.scheduler = scheduler
+        self.progress = progress
+        self.planner = planner
+        self.row_cap = row_cap
+
+    def clipped_at(self, job, table_rows):
+        """
+            Date of the oldest row if the table looks clipped, otherwise None.
+        """
+        from Scraper.row_parser import oldest_date
+
+        oldest = oldest_date(table_rows)
+        start = parse_date(job.start_date)
+        if oldest is None or oldest <= start or not self.planner.is_clipped(job.code, start, oldest):
+            return None
+        return oldest
+
+    def process(self, job):
+        try:
+            table_rows = self.scheduler.submit(job.code, job.start_date, job.end_date, job.host).result()
+        except Exception as e:
+            metrics.increment('scraper_failures_total', reason='retries_exhausted')
+            print(f"Fetching {job.code} failed: {e}")
+            table_rows = None
+        if table_rows is None:
+            self.progress.window_done(job.code, ok=False)
+            return
+
+        halves = split_window(job.start_date, job.end_date) if len(table_rows) >= self.row_cap else None
+        if halves:
+            metrics.increment('scraper_window_splits_total')
+            self.progress.split(job.code, len(halves))
+            for start_date, end_date in halves:
+                yield from self.process(FetchJob(job.code, start_date, end_date, job.host))
+            return
+
+        oldest = self.clipped_at(job, table_rows)
+        if oldest is not None:
+            metrics.increment('scraper_clipped_pages_total')
+            self.progress.split(job.code, 2)
+            yield RawPage(FetchJob(job.code, format_date(oldest), job.end_date, job.host), table_rows)
+            yield from self.process(FetchJob(job.code, job.start_date, format_date(oldest - timedelta(days=1)),
+                                             job.host))
+            return
+        yield RawPage(job, table_rows)
+
+
+class ParseStage(Stage):
+    name = 'rows'
+
+    def __init__(self, worker, progress, concurrency=2, buffer=64):
+        super().__init__(concurrency, buffer)
+        self.worker = worker
+        self.progress = progress
+
+    def process(self, page):
+        job = page.job
+        try:
+            with metrics.timer('row_parse_seconds'):
+                rows = self.worker.build_company_rows(job.code, page.table_rows)
+            metrics.increment('rows_parsed_total', len(rows))
+            checkpoint = self.worker.build_checkpoint(job.code, job.start_date, job.end_date, rows)
+        except Exception:
+            self.progress.window_done(job.code, ok=False)
+            raise
+        yield ParsedWindow(job, rows, checkpoint)
+
+
+class WriteStage(Stage):
+    """
+        Hands the rows to the IngestionStage writer, which also refreshes the weekly and
+        monthly rollups in the same transaction. Passes on the code of every company
+        whose windows are all committed, after marking it up to date.
+    """
+    name = 'writes'
+
+    def __init__(self, ingestion, progress, buffer=64):
+        super().__init__(buffer=buffer)
+        self.ingestion = ingestion
+        self.progress = progress
+
+    def written(self, code):
+        # Runs on the writer thread once the window's rows are committed
+        def callback(written):
+            if not self.progress.window_done(code, ok=code not in self.ingestion.failed_codes):
+                return
+            update_last_update_by_code(code, get_current_date())
+            print(f"Data loaded for {code}! ({self.ingestion.stats()['queue_depth']} waiting to be written)")
+            self.emit(code)
+        return callback
+
+    def process(self, window):
+        self.ingestion.put(window.rows, self.written(window.job.code), window.checkpoint)
+        return ()
+
+    def close(self):
+        self.ingestion.flush()
+
+
+class CodeFilter(Filter):
+    def __init__(self, max_window_days=MAX_WINDOW_DAYS, row_cap=ROW_CAP):
+        self.keys = []
+        self.plan = {}
+        self.progress = CompanyProgress()
+        self.max_window_days = max_window_days
+        self.row_cap = row_cap
+        # Plans the windows, and later tells the fetch stage how dense an issuer's rows should be
+        self.planner = SyncPlanner(max_window_days=max_window_days, row_cap=row_cap)
+
+    def stages(self, pool_size, webdriver_pool):
+        host = urlparse(self.base_url).netloc
+        return [CodeStage(self.create_worker(webdriver_pool), self), PlanStage(self, host)]
 
-        print(str(len(self.keys)) + " companies are going to be updated...")
-        return self.keys
 
 class CompanyFilter(Filter):
-    def __init__(self, code_filter):
+    def __init__(self, code_filter, requests_per_second=4.0, max_retries=3, ingestion=None,
+                 fetch_concurrency=None, parse_concurrency=2, buffer=64):
         self.code_filter = code_filter
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        # Scraped rows are written by this stage's writer thread, not by the scraper threads
+        self.ingestion = ingestion
+        self.owns_ingestion = False
+        self.fetch_concurrency = fetch_concurrency
+        self.parse_concurrency = parse_concurrency
+        self.buffer = buffer
+        self.scheduler = None
+
+    def stages(self, pool_size, webdriver_pool):
+        if self.ingestion is None:
+            self.ingestion = IngestionStage()
+            self.owns_ingestion = True
+        worker = self.create_worker(webdriver_pool)
+        fetch_concurrency = self.fetch_concurrency or pool_size
+
+        # Every (company, window) request goes through one scheduler whose concurrency
+        # matches the pool size, so no thread ever waits on a driver it can't get
+        self.scheduler = FetchScheduler(worker.fetch_page,
+                                        max_concurrency=min(fetch_concurrency, pool_size),
+                                        requests_per_second=self.requests_per_second,
+                                        max_retries=self.max_retries)
+        progress = self.code_filter.progress
+        return [FetchStage(self.scheduler, progress, self.code_filter.planner, fetch_concurrency, self.buffer,
+                           self.code_filter.row_cap),
+                ParseStage(worker, progress, self.parse_concurrency, self.buffer),
+                WriteStage(self.ingestion, progress, self.buffer)]
 
-    def process_data(self, pool_size, webdriver_pool):
-        while get_last_update_for_all_companies() is None: continue
-        with ThreadPoolExecutor() as main_executor:
-            worker = SeleniumWorker(webdriver_pool)
-            main_futures = [main_executor.submit(worker.fetch_data_for_company(company)) for company in get_last_update_for_all_companies()]
-            for future in as_completed(main_futures):
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.scheduler = None
+        if self.owns_ingestion:
+            self.ingestion.close()
+            self.ingestion = None
+            self.owns_ingestion = False
+        elif self.ingestion is not None:
+            self.ingestion.flush()
 
-                continue
-        webdriver_pool.close_all()
-        return ['Data is stored']
 
 class Pipe:
-    def __init__(self, filters):
+    def __init__(self, filters, engine='selenium', base_url=MSE_BASE_URL, pool_size=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown scraper engine: {engine}. Choose one of {ENGINES}.")
         self.filters = filters
-        self.pool_size = min(32, os.cpu_count() + 4)
-        self.webdriver_pool = WebDriverPool(self.pool_size, set_driver_options())
+        self.engine = engine
+        self.base_url = base_url
+        # Drivers or sessions in the pool, which also caps the concurrent fetches
+        self.pool_size = pool_size or min(32, os.cpu_count() + 4)
+        self.stats = {}
+        self.scheduler_stats = None
+        self._pool = None
+
+    @property
+    def webdriver_pool(self):
+        # Created when the flow starts, so building a Pipe doesn't import Selenium or requests
+        if self._pool is None:
+            if self.engine == 'http':
+                from Scraper.http_session_pool import HttpSessionPool
+                self._pool = HttpSessionPool(self.pool_size)
+            else:
+                from Scraper.web_driver_pool import WebDriverPool
+                self._pool = WebDriverPool(self.pool_size, set_driver_options())
+        return self._pool
 
     def start_flow(self):
+        """
+            Streams the site through every filter's stages and returns the codes of the
+            companies that were brought up to date, in the order they finished.
+        """
+        stages = []
         for _filter in self.filters:
-            _filter.process_data(self.pool_size, self.webdriver_pool)
\ No newline at end of file
+            _filter.base_url = self.base_url
+            stages.extend(_filter.stages(self.pool_size, self.webdriver_pool))
+
+        metrics.reset()
+        started_at = datetime.now()
+        streaming_pipe = StreamingPipe(stages)
+        loaded = []
+        first_company = None
+        try:
+            for code in streaming_pipe.run([self.base_url]):
+                if not loaded:
+                    first_company = time.perf_counter() - streaming_pipe.started
+                    print(f"First company loaded after {first_company:.2f}s")
+                loaded.append(code)
+        finally:
+            # Read before the filters close and drop their scheduler
+            schedulers = [_filter.scheduler for _filter in self.filters if getattr(_filter, 'scheduler', None)]
+            self.scheduler_stats = schedulers[0].stats() if schedulers else None
+            for _filter in self.filters:
+                _filter.close()
+            self.webdriver_pool.close_all()
+            self.stats = streaming_pipe.stats()
+            write_run_summary(self.run_summary(streaming_pipe, started_at, loaded, first_company))
+        return loaded
+
+    def run_summary(self, streaming_pipe, started_at, loaded, first_company):
+        finished_at = datetime.now()
+        duration = (finished_at - started_at).total_seconds()
+        rows_written = metrics.total('db_rows_written_total')
+        pool_stats = self.webdriver_pool.stats() if hasattr(self.webdriver_pool, 'stats') else None
+        return {
+            'engine': self.engine,
+            'base_url': self.base_url,
+            'pool_size': self.pool_size,
+            'started_at': started_at.isoformat(),
+            'finished_at': finished_at.isoformat(),
+            'finished_timestamp': finished_at.timestamp(),
+            'duration_seconds': duration,
+            'companies_loaded': len(loaded),
+            'first_company_seconds': first_company,
+            'rows_written': rows_written,
+            'rows_per_second': rows_written / duration if duration else 0,
+            'stages': self.stats,
+            'scheduler': self.scheduler_stats,
+            'pool': pool_stats,
+            'metrics': metrics.snapshot(),
+        }
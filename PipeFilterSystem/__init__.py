@@ -1 +1,3 @@
 from .PipeFilterSystem import PipeFilterSystem, Pipe, CompanyFilter, CodeFilter
+from .ingestion import IngestionStage
+from .streaming import Stage, StreamingPipe
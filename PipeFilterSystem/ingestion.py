@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+
+from Data.db_functions import insert_company_data_bulk
+from Metrics import metrics
+
+
+class IngestionStage:
+    """
+        Producer/consumer stage between the scrapers and the database.
+
+        Scrapers put parsed rows on a bounded queue and go straight back to
+        fetching; one writer thread drains the queue and writes up to `batch_rows`
+        rows per transaction. When the writer falls behind and `max_pending`
+        windows are waiting, put() blocks, which slows the scrapers down instead
+        of buffering without limit.
+
+        Callbacks run on the writer thread after the rows queued before them are
+        committed, in the order they were queued, e.g. to mark a company as up to
+        date only once all its rows are on disk.
+
+        Example usage:
+            stage = IngestionStage()
+            stage.put(rows)
+            stage.put([], lambda written: update_last_update_by_code(code, today))
+            stage.close()
+    """
+
+    def __init__(self, max_pending=64, batch_rows=5000, write=insert_company_data_bulk):
+        self.batch_rows = batch_rows
+        self.write = write
+        self.failed_codes = set()
+
+        self.rows_written = 0
+        self.batches = 0
+        self.put_wait_time = 0.0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='ingestion-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, rows, callback=None, checkpoint=None):
+        """
+            Queues rows for writing, blocking while the queue is full.
+            checkpoint is the FetchCheckpoint dict of the window the rows came from,
+            committed together with them.
+            callback(written) is called once the batch holding the rows is committed,
+            with None if the batch could not be written.
+        """
+        if self._closed:
+            raise RuntimeError("Ingestion stage is closed.")
+        started = time.perf_counter()
+        self._queue.put((rows, callback, checkpoint))
+        waited = time.perf_counter() - started
+        self.put_wait_time += waited
+        metrics.observe('ingestion_put_wait_seconds', waited)
+
+    def _next_batch(self):
+        # Returns the items for the next transaction and whether the stop marker was seen
+        item = self._queue.get()
+        if item is None:
+            self._queue.task_done()
+            return [], True
+        batch = [item]
+        size = len(item[0])
+        # Take whatever else is already waiting, up to the batch size
+        while size < self.batch_rows:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.task_done()
+                return batch, True
+            batch.append(item)
+            size += len(item[0])
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+
+            rows = [row for item_rows, _, _ in batch for row in item_rows]
+            checkpoints = [checkpoint for _, _, checkpoint in batch if checkpoint is not None]
+            written = 0
+            if rows or checkpoints:
+                with metrics.timer('db_commit_seconds'):
+                    written = self.write(rows, checkpoints)
+                self.batches += 1
+                metrics.increment('db_batches_total')
+                if written is None:
+                    # Rolled back, checkpoint-only windows included
+                    metrics.increment('db_write_failures_total')
+                    self.failed_codes.update(row['code'] for row in rows)
+                    self.failed_codes.update(checkpoint['code'] for checkpoint in checkpoints)
+                else:
+                    self.rows_written += written
+                    metrics.increment('db_rows_written_total', written)
+
+            for item_rows, callback, _ in batch:
+                if callback is not None:
+                    try:
+                        callback(written if item_rows or written is None else 0)
+                    except Exception as e:
+                        print(f"Ingestion callback failed: {e}")
+                self._queue.task_done()
+
+    def flush(self):
+        """
+            Blocks until everything queued so far is written.
+        """
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        """
+            Writes what is still queued and stops the writer thread. Safe to call twice.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'rows_written': self.rows_written,
+            'batches': self.batches,
+            'put_wait_time': self.put_wait_time,
+        }
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+
+from Metrics import metrics
+
+# Marks the end of the stream on a stage's queue
+_END = object()
+
+
+class Stage:
+    """
+        One step of a StreamingPipe.
+
+        process(item) is called for every item that comes from upstream and yields
+        the items for the next stage, which can start on them right away. It runs on
+        `concurrency` threads. At most `buffer` items wait between this stage and the
+        next one, so a slow stage holds back the ones before it instead of letting
+        its input pile up in memory.
+
+        Items can also be passed on later with emit(), e.g. from a callback; close()
+        runs after the last item and must wait for such callbacks. An exception from
+        open() or close() is kept in `failure` and raised again by StreamingPipe.run().
+    """
+    name = 'stage'
+
+    def __init__(self, concurrency=1, buffer=64):
+        self.concurrency = concurrency
+        self.buffer = buffer
+
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.first_emit = None
+        self.failure = None
+
+        self._output = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        pass
+
+    def process(self, item):
+        return ()
+
+    def close(self):
+        pass
+
+    def emit(self, item):
+        with self._lock:
+            self.emitted += 1
+            if self.first_emit is None:
+                self.first_emit = time.perf_counter()
+        self._output.put(item)
+
+    def _work(self, inputs):
+        while True:
+            item = inputs.get()
+            if item is _END:
+                # Leave the marker for the other threads of this stage
+                inputs.put(_END)
+                return
+            started = time.perf_counter()
+            try:
+                for output in self.process(item) or ():
+                    self.emit(output)
+            except Exception as e:
+                print(f"Stage {self.name} failed on {item}: {e}")
+                metrics.increment('pipeline_stage_errors_total', stage=self.name)
+                with self._lock:
+                    self.errors += 1
+            # Includes the time spent waiting for room downstream
+            elapsed = time.perf_counter() - started
+            metrics.observe('pipeline_stage_seconds', elapsed, stage=self.name)
+            with self._lock:
+                self.processed += 1
+                self.busy_time += elapsed
+
+    def _discard(self, inputs):
+        # A stage that could not start still takes its input, or the stage before it
+        # would block forever on a full queue
+        while inputs.get() is not _END:
+            pass
+        inputs.put(_END)
+
+    def _run(self, inputs):
+        try:
+            self.open()
+        except Exception as e:
+            self.failure = e
+            print(f"Stage {self.name} could not start: {e}")
+            self._discard(inputs)
+            self._output.put(_END)
+            return
+        try:
+            threads = [threading.Thread(target=self._work, args=(inputs,), name=f"{self.name}-{n}", daemon=True)
+                       for n in range(self.concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.close()
+        except Exception as e:
+            self.failure = e
+            print(f"Stage {self.name} stopped: {e}")
+        finally:
+            self._output.put(_END)
+
+
+class StreamingPipe:
+    """
+        Runs stages as a chain of threads connected by bounded queues.
+
+        Every item moves to the next stage as soon as it is ready, so the first results
+        come out of the last stage while the first stages are still producing.
+
+        Example usage:
+            pipe = StreamingPipe([PlanStage(...), FetchStage(...), WriteStage(...)])
+            for result in pipe.run(codes):
+                print(result)
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.started = None
+        self.finished = None
+
+    def _feed(self, items, inputs):
+        try:
+            for item in items:
+                inputs.put(item)
+        finally:
+            inputs.put(_END)
+
+    def run(self, items):
+        """
+            Feeds `items` to the first stage and yields what comes out of the last one.
+            Raises the error of the first stage that failed to open or close, once the
+            stream has ended.
+        """
+        self.started = time.perf_counter()
+        inputs = queue.Queue(maxsize=self.stages[0].buffer)
+        threads = [threading.Thread(target=self._feed, args=(items, inputs), name="pipe-feed", daemon=True)]
+        for stage in self.stages:
+            stage._output = queue.Queue(maxsize=stage.buffer)
+            threads.append(threading.Thread(target=stage._run, args=(inputs,), name=stage.name, daemon=True))
+            inputs = stage._output
+        for thread in threads:
+            thread.start()
+
+        while True:
+            item = inputs.get()
+            if item is _END:
+                break
+            yield item
+
+        for thread in threads:
+            thread.join()
+        self.finished = time.perf_counter()
+
+        for stage in self.stages:
+            if stage.failure is not None:
+                raise stage.failure
+
+    def stats(self):
+        """
+            Per stage counters; first_emit is the seconds from the start until the
+            stage passed on its first item.
+        """
+        return {
+            stage.name: {
+                'concurrency': stage.concurrency,
+                'processed': stage.processed,
+                'emitted': stage.emitted,
+                'errors': stage.errors,
+                'busy_time': stage.busy_time,
+                'first_emit': stage.first_emit - self.started if stage.first_emit else None,
+                'queued': stage._output.qsize() if stage._output else 0,
+            }
+            for stage in self.stages
+        }
@@ -1,2 +1,10 @@
-from .selenium_scraper import SeleniumWorker
-from .web_driver_pool import WebDriverPool
\ No newline at end of file
+from Metrics.startup import lazy_exports
+
+# Loaded on first access, so the HTTP engine runs without importing Selenium
+__getattr__ = lazy_exports(__name__, {
+    'SeleniumWorker': '.selenium_scraper',
+    'WebDriverPool': '.web_driver_pool',
+    'HttpWorker': '.http_scraper',
+    'HttpSessionPool': '.http_session_pool',
+    'FetchScheduler': '.fetch_scheduler',
+})
@@ -0,0 +1,164 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class FetchJob:
+    """
+        One (issuer, date-window) request for the scheduler.
+    """
+
+    def __init__(self, code, start_date, end_date, host="www.mse.mk"):
+        self.code = code
+        self.start_date = start_date
+        self.end_date = end_date
+        self.host = host
+        self.attempts = 0
+
+    def __repr__(self):
+        return f"FetchJob {self.code} {self.start_date}-{self.end_date}"
+
+
+class RateLimiter:
+    """
+        Spaces requests to one host so that at most `requests_per_second` start each second.
+    """
+
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            wait_time = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+
+class FetchScheduler:
+    """
+        Single asyncio scheduler for all scrape requests.
+
+        Jobs go into one queue and are run by `max_concurrency` workers, so there
+        is one global limit instead of nested thread pools. Each host is rate
+        limited separately and failed jobs are retried with exponential backoff.
+
+        `fetch` is the blocking call that loads one page, called as
+        fetch(start_date, end_date, code), e.g. SeleniumWorker.fetch_page. It runs on
+        a private thread pool sized to the concurrency limit, so it never waits for a
+        driver that another blocked thread is holding. The future of a job holds the
+        page's table rows, which the pipe's fetch stage passes on to be parsed and
+        written by the IngestionStage.
+
+        Example usage:
+            scheduler = FetchScheduler(worker.fetch_page, max_concurrency=8)
+            table_rows = scheduler.submit("ALKB", "01.01.2024", "31.12.2024").result()
+            rows = worker.build_company_rows("ALKB", table_rows)
+            scheduler.close()
+    """
+
+    def __init__(self, fetch, max_concurrency=8, requests_per_second=4.0, host_limits=None,
+                 max_retries=3, backoff=1.0):
+        self.fetch = fetch
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.host_limits = host_limits or {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+        self._limiters = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fetch")
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._workers = []
+        self._thread = threading.Thread(target=self._run_loop, name="fetch-scheduler", daemon=True)
+        self._started = threading.Event()
+        self._thread.start()
+        self._started.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._workers = [self._loop.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        self._loop.call_soon(self._started.set)
+        self._loop.run_forever()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'retried': self.retried,
+        }
+
+    def submit(self, code, start_date, end_date, host="www.mse.mk"):
+        """
+            Queues a fetch and returns a concurrent.futures.Future for its result.
+        """
+        future = Future()
+        job = FetchJob(code, start_date, end_date, host)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (job, future))
+        return future
+
+    def _limiter_for(self, host):
+        if host not in self._limiters:
+            self._limiters[host] = RateLimiter(self.host_limits.get(host, self.requests_per_second))
+        return self._limiters[host]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future = await self._queue.get()
+            try:
+                await self._limiter_for(job.host).acquire()
+                self.in_flight += 1
+                try:
+                    job.attempts += 1
+                    result = await loop.run_in_executor(self._executor, self.fetch,
+                                                        job.start_date, job.end_date, job.code)
+                finally:
+                    self.in_flight -= 1
+            except Exception as e:
+                if job.attempts <= self.max_retries:
+                    self.retried += 1
+                    delay = self.backoff * 2 ** (job.attempts - 1) * (1 + random.random() / 2)
+                    print(f"{job} failed ({e}), retrying in {delay:.1f}s")
+                    loop.call_later(delay, self._queue.put_nowait, (job, future))
+                else:
+                    self.failed += 1
+                    future.set_exception(e)
+            else:
+                self.completed += 1
+                future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _cancel_workers(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def close(self):
+        # The workers have to finish cancelling before the loop stops, or they are destroyed pending
+        asyncio.run_coroutine_threadsafe(self._cancel_workers(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=True)
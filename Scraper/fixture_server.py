@@ -0,0 +1,277 @@
+"""
+Local HTTP stand-in for mse.mk that serves recorded fixture pages.
+
+Lets the scrapers run offline:
+
+    python -m Scraper.fixture_server --port 8765
+    python main.py --engine http --base-url http://127.0.0.1:8765
+
+Record what a real run sees, then replay it with added latency and errors:
+
+    python -m Scraper.fixture_server --fixtures recorded --record https://www.mse.mk
+    python main.py --engine selenium --base-url http://127.0.0.1:8765 --rps 1
+    python -m Scraper.fixture_server --fixtures recorded --latency 0.2 --jitter 0.1 --error-rate 0.05
+
+Routes:
+    GET       /mk/issuers/free-market          -> <fixtures>/free-market.html
+    GET       /mk/stats/symbolhistory/<key>    -> <fixtures>/symbolhistory/<key>.html
+    POST      /mk/stats/symbolhistory/<key>    -> <fixtures>/symbolhistory/<key>/<FromDate>_<ToDate>.html
+                                                  if that window was recorded, otherwise the rows of
+                                                  <key>.html dated inside FromDate-ToDate
+
+In record mode every request is forwarded to the upstream site and the responses
+of these routes are saved under the paths above before they are served.
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# First cell of a history table row, the trading date
+_ROW_DATE = re.compile(r'<td[^>]*>\s*(\d{1,2}\.\d{1,2}\.\d{4})\s*</td>')
+
+
+def fixture_path(fixtures_dir, path, form=None):
+    """
+        Returns the fixture file of a request path and its form fields, None for
+        paths that are not part of the stand-in.
+    """
+    path = path.split('?', 1)[0].rstrip('/')
+    if path == '/mk/issuers/free-market':
+        return os.path.join(fixtures_dir, 'free-market.html')
+    prefix = '/mk/stats/symbolhistory/'
+    if not path.startswith(prefix):
+        return None
+    key = os.path.basename(path[len(prefix):])
+    if form and form.get('FromDate') and form.get('ToDate'):
+        window = f"{os.path.basename(form['FromDate'])}_{os.path.basename(form['ToDate'])}.html"
+        return os.path.join(fixtures_dir, 'symbolhistory', key, window)
+    return os.path.join(fixtures_dir, 'symbolhistory', f"{key}.html")
+
+
+class HistoryPage:
+    """
+        A saved symbol history page split around the rows of its results table,
+        so any date window can be cut out of it without parsing the HTML again.
+    """
+
+    def __init__(self, html):
+        self.head, self.tail, self.rows = html, '', []
+        table = html.find('resultsTable')
+        body = html.find('<tbody', table) if table != -1 else -1
+        if body == -1:
+            return
+        body_start = html.find('>', body) + 1
+        body_end = html.find('</tbody>', body_start)
+        if body_end == -1:
+            return
+        self.head, self.tail = html[:body_start], html[body_end:]
+        for row in html[body_start:body_end].split('</tr>'):
+            match = _ROW_DATE.search(row)
+            if match:
+                self.rows.append((datetime.strptime(match.group(1), '%d.%m.%Y').date(), f"{row}</tr>"))
+
+    def window(self, start_date, end_date):
+        start = datetime.strptime(start_date, '%d.%m.%Y').date()
+        end = datetime.strptime(end_date, '%d.%m.%Y').date()
+        rows = ''.join(row for day, row in self.rows if start <= day <= end)
+        return f"{self.head}{rows}\n{self.tail}"
+
+
+class Faults:
+    """
+        Latency and errors added to every routed response. Drawn from a seeded
+        generator, so a benchmark sees the same faults on every run.
+
+        Args:
+            latency (float): Seconds every response is held back.
+            jitter (float): Up to this many extra seconds, uniformly distributed.
+            error_rate (float): Share of requests answered with `error_status`.
+            error_status (int): HTTP status of an injected error.
+            seed (int): Seed of the generator.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """
+            Returns (delay in seconds, True if the request should fail) for one request.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter) if self.jitter else self.latency
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        return delay, failed
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    fixtures_dir = FIXTURES_DIR
+    faults = Faults()
+    # Base URL of the site responses are recorded from, None to replay
+    upstream = None
+
+    _pages = {}
+    _pages_lock = threading.Lock()
+
+    def _history_page(self, path):
+        # Parsed once per file version and shared by all handler threads
+        modified = os.path.getmtime(path)
+        with self._pages_lock:
+            cached = self._pages.get(path)
+            if cached is None or cached[0] != modified:
+                with open(path, encoding='utf-8') as f:
+                    cached = self._pages[path] = (modified, HistoryPage(f.read()))
+        return cached[1]
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _replay(self, fixture, form):
+        if os.path.isfile(fixture):
+            with open(fixture, 'rb') as f:
+                return self._send(200, f.read())
+        # Windows that were not recorded are cut from the company's full page
+        page = fixture_path(self.fixtures_dir, self.path)
+        if page != fixture and os.path.isfile(page):
+            try:
+                body = self._history_page(page).window(form['FromDate'], form['ToDate'])
+            except ValueError:
+                return self.send_error(400, "Dates must be dd.mm.yyyy")
+            return self._send(200, body.encode('utf-8'))
+        self.send_error(404)
+
+    def _record(self, fixture, data):
+        import requests
+
+        headers = {name: self.headers[name] for name in ('Content-Type', 'User-Agent') if self.headers.get(name)}
+        response = requests.request(self.command, f"{self.upstream}{self.path}", data=data, headers=headers,
+                                    timeout=60)
+        if fixture is not None and response.status_code == 200:
+            os.makedirs(os.path.dirname(fixture), exist_ok=True)
+            temporary = f"{fixture}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(response.content)
+            os.replace(temporary, fixture)
+        self._send(response.status_code, response.content,
+                   response.headers.get('Content-Type', 'application/octet-stream'))
+
+    def _serve(self, data=b''):
+        form = {name: values[0] for name, values in parse_qs(data.decode('utf-8', 'replace')).items()}
+        fixture = fixture_path(self.fixtures_dir, self.path, form)
+        if self.upstream is not None:
+            # Stylesheets and scripts the browser asks for are passed through, not saved
+            return self._record(fixture, data)
+        if fixture is None:
+            return self.send_error(404)
+
+        delay, failed = self.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return self.send_error(self.faults.error_status, "Injected error")
+        self._replay(fixture, form)
+
+    def do_GET(self):
+        self._serve()
+
+    def do_POST(self):
+        # Read the whole form body, which also keeps keep-alive connections usable
+        self._serve(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+        Runs the stand-in on a background thread.
+
+        Example usage:
+            with FixtureServer() as server:
+                worker = HttpWorker(HttpSessionPool(4), base_url=server.url)
+
+            # Every page takes 50-150 ms and one in 20 fails
+            with FixtureServer(faults=Faults(latency=0.05, jitter=0.1, error_rate=0.05)) as server:
+                ...
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, host='127.0.0.1', port=0, faults=None, upstream=None):
+        self.faults = faults or Faults()
+        handler = type('Handler', (FixtureRequestHandler,), {
+            'fixtures_dir': fixtures_dir,
+            'faults': self.faults,
+            'upstream': upstream.rstrip('/') if upstream else None,
+            '_pages': {},
+        })
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve recorded MSE pages locally.")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--record', metavar='UPSTREAM',
+                        help="Forward requests to this site, e.g. https://www.mse.mk, and save the responses.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra seconds per response.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests that get an error.")
+    parser.add_argument('--error-status', type=int, default=503, help="HTTP status of the injected errors.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the latency and error draws.")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.error_status, args.seed)
+    server = FixtureServer(args.fixtures, args.host, args.port, faults, args.record)
+    if args.record:
+        print(f"Recording {args.record} into {args.fixtures} on {server.url}")
+    else:
+        print(f"Serving fixtures from {args.fixtures} on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"{faults.requests} requests, {faults.errors} injected errors")
@@ -0,0 +1,110 @@
+from html.parser import HTMLParser
+
+import requests
+
+from Metrics import metrics
+from Scraper.selenium_scraper import SeleniumWorker, MSE_BASE_URL
+
+# id of the results table on the symbol history page
+HISTORY_TABLE_ID = 'resultsTable'
+
+
+class TableRowParser(HTMLParser):
+    """
+        Streaming parser that collects the text of every <td> grouped by <tr>.
+
+        Feed it chunks as they arrive from the socket; finished rows are
+        available in `rows` without building a DOM for the whole page.
+        With `table_id` only the rows of that table are collected.
+    """
+
+    def __init__(self, table_id=None):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        self.table_found = False
+        self.rows = []
+        self._row = None
+        self._cell = None
+        self._table_depth = 0
+
+    def _collecting(self):
+        return self.table_id is None or self._table_depth > 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table' and self.table_id is not None:
+            if self._table_depth or dict(attrs).get('id') == self.table_id:
+                self._table_depth += 1
+                self.table_found = True
+        elif tag == 'tr' and self._collecting():
+            self._row = []
+        elif tag == 'td' and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == 'table' and self._table_depth:
+            self._table_depth -= 1
+        elif tag == 'td' and self._cell is not None:
+            self._row.append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            if self._row:
+                self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+class HttpWorker(SeleniumWorker):
+    """
+        Scraper engine that talks to mse.mk with plain HTTP requests.
+
+        Has the same interface as SeleniumWorker, but posts the FromDate/ToDate
+        form directly and parses the response instead of driving a browser.
+        Takes an HttpSessionPool in place of a WebDriverPool.
+    """
+
+    def __init__(self, session_pool, base_url=MSE_BASE_URL):
+        super().__init__(session_pool, base_url)
+
+    def _fetch_rows(self, method, url, data=None, table_id=None):
+        session = self.driver_pool.get_session()
+        try:
+            parser = TableRowParser(table_id)
+            with session.request(method, url, data=data, stream=True, timeout=self.driver_pool.timeout) as response:
+                response.raise_for_status()
+                response.encoding = response.encoding or 'utf-8'
+                for chunk in response.iter_content(chunk_size=16384, decode_unicode=True):
+                    parser.feed(chunk)
+            parser.close()
+            return parser
+        finally:
+            self.driver_pool.release_session(session)
+
+    def fetch_company_keys(self):
+        parser = self._fetch_rows('GET', f"{self.base_url}/mk/issuers/free-market")
+        print("Filled company keys to database.")
+        return [row[0] for row in parser.rows]
+
+    def fetch_page(self, start_date, end_date, key):
+        url = f"{self.base_url}/mk/stats/symbolhistory/{key}"
+        try:
+            with metrics.timer('scraper_page_load_seconds', engine='http'):
+                parser = self._fetch_rows('POST', url, data={'FromDate': start_date, 'ToDate': end_date, 'Code': key},
+                                          table_id=HISTORY_TABLE_ID)
+        except requests.Timeout:
+            metrics.increment('scraper_timeouts_total', engine='http')
+            raise
+        except requests.RequestException:
+            # Error statuses included, raised for the FetchScheduler to retry with backoff
+            metrics.increment('scraper_failures_total', engine='http', reason='request')
+            raise
+
+        if not parser.table_found:
+            # A maintenance or captcha page, raised so the window is retried instead of checkpointed empty
+            metrics.increment('scraper_failures_total', engine='http', reason='no_table')
+            raise RuntimeError(f"No history table on the page of {key} {start_date}-{end_date}")
+
+        metrics.increment('scraper_pages_total', engine='http')
+        return parser.rows
@@ -0,0 +1,44 @@
+import queue
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpSessionPool:
+    """
+        Pool of requests sessions with keep-alive connections to mse.mk.
+
+        Mirrors the WebDriverPool interface so the pipeline can hand it to a
+        worker the same way, but each slot is a few hundred KB instead of a
+        whole Chrome process.
+    """
+
+    def __init__(self, size, timeout=10):
+        self.size = size
+        self.timeout = timeout
+        self.pool = queue.Queue(maxsize=size)
+        self._initialize_pool()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": "BrokerBot/1.0"})
+        return session
+
+    def _initialize_pool(self):
+        for _ in range(self.size):
+            self.pool.put(self._create_session())
+
+    def get_session(self):
+        return self.pool.get()
+
+    def release_session(self, session):
+        if session:
+            self.pool.put(session)
+
+    def close_all(self):
+        while not self.pool.empty():
+            session = self.pool.get()
+            session.close()
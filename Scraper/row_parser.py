@@ -0,0 +1,111 @@
+"""
+Parser for the MSE symbol history table.
+
+The table has 9 columns: the date as d.m.yyyy and 8 numbers in Macedonian format,
+'.' for thousands and ',' for decimals (18.363,00). Empty cells mean no trades and
+are stored as 0. A whole table is converted at once, with one pass of string
+replacements and one NumPy conversion, instead of strptime and float() per cell.
+"""
+import numpy as np
+
+HISTORY_COLUMNS = ['last_trade_price', 'max_price', 'min_price', 'avg_price', 'percent_change',
+                   'volume', 'turnover_best_denars', 'total_turnover_denars']
+
+# Cells per table row: the date plus HISTORY_COLUMNS
+HISTORY_CELLS = 1 + len(HISTORY_COLUMNS)
+
+HISTORY_DTYPE = np.dtype([('date', 'datetime64[D]')] + [(column, 'f8') for column in HISTORY_COLUMNS])
+
+
+class TableParseError(ValueError):
+    pass
+
+
+def parse_mk_numbers(values):
+    """
+        Converts Macedonian formatted numbers to a float64 array, '' becomes 0.
+
+        The cells are joined into one string so the separators are swapped with two
+        str.replace calls for the whole table, then converted in one np.array call.
+    """
+    values = [value or '0' for value in values]
+    text = '|'.join(values).replace('.', '').replace(',', '.')
+    parts = text.split('|')
+    if len(parts) != len(values):
+        raise TableParseError("A number cell contains '|'.")
+    try:
+        return np.array(parts, dtype=np.float64)
+    except ValueError as e:
+        raise TableParseError(f"Not a number: {e}")
+
+
+def parse_mk_dates(values):
+    """
+        Converts d.m.yyyy strings to a datetime64[D] array, NaT where the text is not a real date.
+    """
+    values = list(values)
+    dates = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+    shaped = np.array([value.count('.') == 2 for value in values], dtype=bool)
+    if not shaped.any():
+        return dates
+
+    parts = '.'.join([value for value, ok in zip(values, shaped) if ok]).split('.')
+    try:
+        numbers = np.array(parts, dtype=np.int64)
+    except ValueError:
+        numbers = np.array([int(part) if part.isdigit() else 0 for part in parts], dtype=np.int64)
+    day, month, year = numbers.reshape(-1, 3).T
+
+    valid = (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (year >= 1000) & (year <= 9999)
+    months = ((year - 1970) * 12 + np.clip(month, 1, 12) - 1).astype('datetime64[M]')
+    parsed = months.astype('datetime64[D]') + (np.clip(day, 1, 31) - 1)
+    # 31.02 would roll over into March
+    valid &= parsed.astype('datetime64[M]') == months
+    dates[shaped] = np.where(valid, parsed, np.datetime64('NaT', 'D'))
+    return dates
+
+
+def oldest_date(table_rows):
+    """
+        Earliest date in the first cells of history table rows, None if there is none.
+    """
+    dates = parse_mk_dates(row[0] for row in table_rows if row)
+    dates = dates[~np.isnat(dates)]
+    if not len(dates):
+        return None
+    return dates.min().astype(object)
+
+
+def parse_history_table(table_rows):
+    """
+        Parses the rows of a history table into a structured array of HISTORY_DTYPE.
+
+        Every row must have exactly HISTORY_CELLS cells, otherwise TableParseError is
+        raised. Rows whose first cell is not a date (headers, notes) are left out.
+    """
+    if not table_rows:
+        return np.empty(0, dtype=HISTORY_DTYPE)
+    widths = {len(row) for row in table_rows}
+    if widths != {HISTORY_CELLS}:
+        raise TableParseError(f"Expected {HISTORY_CELLS} cells per row, got {sorted(widths)}.")
+
+    dates = parse_mk_dates([row[0] for row in table_rows])
+    keep = ~np.isnat(dates)
+    table_rows = [row for row, ok in zip(table_rows, keep) if ok]
+
+    table = np.empty(len(table_rows), dtype=HISTORY_DTYPE)
+    table['date'] = dates[keep]
+    numbers = parse_mk_numbers([cell for row in table_rows for cell in row[1:]]).reshape(-1, len(HISTORY_COLUMNS))
+    for index, column in enumerate(HISTORY_COLUMNS):
+        table[column] = numbers[:, index]
+    return table
+
+
+def history_records(code, table):
+    """
+        Turns a parsed table into dicts ready for insert_company_data_bulk.
+    """
+    columns = {'date': table['date'].astype(object).tolist()}
+    for column in HISTORY_COLUMNS:
+        columns[column] = table[column].tolist()
+    return [{'code': code, **dict(zip(columns, values))} for values in zip(*columns.values())]
@@ -0,0 +1,205 @@
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+from Data.db_functions import get_trading_dates_by_code, get_fetch_checkpoints, get_last_update_for_all_companies
+
+HISTORY_YEARS = 10
+
+# Fixed-date public holidays on which the Macedonian Stock Exchange is closed (month, day).
+# Movable feasts (Orthodox Easter, Ramadan Bayram) are not listed, so they still count as trading days.
+MSE_HOLIDAYS = {(1, 1), (1, 2), (1, 7), (5, 1), (5, 24), (8, 2), (9, 8), (10, 11), (10, 23), (12, 8)}
+
+
+def is_trading_day(day):
+    return day.weekday() < 5 and (day.month, day.day) not in MSE_HOLIDAYS
+
+
+def format_date(day):
+    return day.strftime('%d.%m.%Y')
+
+
+# The widest range requested in one go. A year is what the site is known to return
+# in full; longer ranges are only worth trying once its row limit has been measured.
+MAX_WINDOW_DAYS = 366
+
+# A window that returns this many rows or more is taken as cut off by the site and split
+ROW_CAP = 2000
+
+# Share of ROW_CAP a window is sized to hold, leaves room for busier periods
+WINDOW_FILL = 0.8
+
+# Stored history the trade density of an issuer is estimated from
+DENSITY_DAYS = 730
+
+# A page is taken as clipped when its oldest row comes this many of the issuer's usual
+# trades after the window start, i.e. the site most likely dropped the oldest rows
+CLIP_GAP_ROWS = 10
+
+
+def parse_date(text):
+    return datetime.strptime(text, '%d.%m.%Y').date()
+
+
+def completed_window(window_start, window_end, completed_at):
+    """
+        The part of a checkpointed window whose rows are final. A window fetched during
+        a day can still miss that day's close, so it only counts up to the day before.
+        Returns (window_start, window_end) dates, or None if nothing of it is final.
+    """
+    if completed_at is not None:
+        window_end = min(window_end, completed_at.date() - timedelta(days=1))
+    if window_end < window_start:
+        return None
+    return window_start, window_end
+
+
+def split_window(start_date, end_date):
+    """
+        Splits a 'dd.mm.yyyy' window in two halves, None for a single day.
+    """
+    start, end = parse_date(start_date), parse_date(end_date)
+    if start >= end:
+        return None
+    middle = start + (end - start) // 2
+    return [(format_date(start), format_date(middle)), (format_date(middle + timedelta(days=1)), format_date(end))]
+
+
+class SyncPlanner:
+    """
+        Works out which date ranges are missing from the database for each company.
+
+        For a company with no stored rows, or whose backfill never finished, the whole
+        history is missing. Otherwise only two kinds of gaps are fetched:
+          * the tail from the day after the last stored trading date up to today,
+            skipped when it only contains weekends and holidays;
+          * holes: whole calendar years without a single row, between years that do
+            have rows, which is what a failed window leaves behind.
+        Ranges covered by a fetch checkpoint were already fetched completely and are
+        left out, so an interrupted backfill resumes where it stopped.
+
+        The gaps are cut into as few windows as possible. The number of rows a window
+        returns depends on how often the issuer trades, so the window length comes from
+        the issuer's stored rows per day: long enough to hold about WINDOW_FILL of the
+        site's ROW_CAP. Issuers without stored rows get the widest window, and the fetch
+        stage halves any window that comes back full.
+    """
+
+    def __init__(self, today=None, history_years=HISTORY_YEARS, max_window_days=MAX_WINDOW_DAYS, row_cap=ROW_CAP):
+        self.today = today or date.today()
+        self.history_start = date(self.today.year - history_years, 1, 1)
+        self.max_window_days = max_window_days
+        self.row_cap = row_cap
+
+    def _has_trading_day(self, start, end):
+        day = start
+        while day <= end:
+            if is_trading_day(day):
+                return True
+            day += timedelta(days=1)
+        return False
+
+    def rows_per_day(self, dates):
+        """
+            Stored rows per calendar day of an issuer over the last DENSITY_DAYS, 0 without rows.
+        """
+        if not dates:
+            return 0
+        since = max(self.today - timedelta(days=DENSITY_DAYS), dates[0])
+        recent = len(dates) - bisect_left(dates, since)
+        return recent / max((self.today - since).days, 1)
+
+    def window_days(self, dates):
+        """
+            Window length in days for an issuer, from its stored trading dates.
+        """
+        rows_per_day = self.rows_per_day(dates)
+        if rows_per_day <= 0:
+            return self.max_window_days
+        return int(max(1, min(self.max_window_days, self.row_cap * WINDOW_FILL / rows_per_day)))
+
+    def _subtract(self, ranges, completed):
+        # Removes the checkpointed intervals from the (start, end) ranges
+        remaining = []
+        for start, end in ranges:
+            for done_start, done_end in sorted(completed):
+                if done_end < start or done_start > end:
+                    continue
+                if done_start > start:
+                    remaining.append((start, done_start - timedelta(days=1)))
+                start = max(start, done_end + timedelta(days=1))
+                if start > end:
+                    break
+            if start <= end:
+                remaining.append((start, end))
+        return remaining
+
+    def _windows(self, start, end, window_days):
+        count = -(-((end - start).days + 1) // window_days)
+        length = -(-((end - start).days + 1) // count)
+        windows = []
+        while start <= end:
+            window_end = min(end, start + timedelta(days=length - 1))
+            windows.append((start, window_end))
+            start = window_end + timedelta(days=1)
+        return windows
+
+    def plan_for_code(self, dates, completed=(), finished=True):
+        """
+            Returns the (start_date, end_date) windows to fetch for one company,
+            given its sorted stored trading dates and its completed checkpoint windows.
+        """
+        if not dates or not finished:
+            ranges = [(self.history_start, self.today)]
+        else:
+            ranges = []
+            years_with_data = {day.year for day in dates}
+            for year in range(dates[0].year + 1, dates[-1].year):
+                if year not in years_with_data and year >= self.history_start.year:
+                    ranges.append((date(year, 1, 1), date(year, 12, 31)))
+
+            tail_start = dates[-1] + timedelta(days=1)
+            if tail_start <= self.today:
+                ranges.append((tail_start, self.today))
+
+        window_days = self.window_days(dates)
+        windows = []
+        for start, end in self._subtract(ranges, completed):
+            if self._has_trading_day(start, end):
+                windows.extend(self._windows(start, end, window_days))
+        return [(format_date(start), format_date(end)) for start, end in windows]
+
+    def load(self):
+        """
+            Reads the stored trading dates, checkpoints and unfinished companies once,
+            so plan_code can be called for one company at a time without querying again.
+            Returns False if the trading dates could not be read.
+        """
+        self.dates_by_code = get_trading_dates_by_code()
+        if self.dates_by_code is None:
+            print("Could not read stored trading dates, nothing will be synced.")
+            return False
+        self.checkpoints = {code: [window for window in (completed_window(*checkpoint) for checkpoint in checkpoints)
+                                   if window is not None]
+                            for code, checkpoints in get_fetch_checkpoints().items()}
+        # Companies are marked up to date only after all their windows are written
+        self.unfinished = {code for code, last_update in get_last_update_for_all_companies() or []
+                           if last_update in (None, 'None')}
+        return True
+
+    def plan_code(self, code):
+        """
+            Returns the windows to fetch for one company, load() must have been called.
+        """
+        return self.plan_for_code(self.dates_by_code.get(code, []), self.checkpoints.get(code, ()),
+                                  finished=code not in self.unfinished)
+
+    def is_clipped(self, code, window_start, oldest):
+        """
+            True if a page of the window starting at `window_start` whose oldest row is
+            dated `oldest` most likely lost its oldest rows. Only judged for issuers with
+            stored rows, load() must have been called.
+        """
+        rows_per_day = self.rows_per_day(self.dates_by_code.get(code, []))
+        if rows_per_day <= 0:
+            return False
+        return (oldest - window_start).days > CLIP_GAP_ROWS / rows_per_day
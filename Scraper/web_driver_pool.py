@@ -1,29 +1,220 @@
+import threading
+import time
+from contextlib import contextmanager
+
 from selenium import webdriver
-import queue
+
+try:
+    import psutil
+except ImportError:  # Memory based recycling is skipped without psutil
+    psutil = None
+
+# A headless Chrome tree (driver, browser, renderers) that grew past this is recycled,
+# a fresh one needs a few hundred MB
+MAX_DRIVER_MEMORY_MB = 1024
+
+
+class DriverPoolTimeout(Exception):
+    pass
+
+
+class DriverPoolClosed(Exception):
+    pass
+
+
+class _DriverInfo:
+    def __init__(self):
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.uses = 0
+
 
 class WebDriverPool:
-    def __init__(self, size, driver_options):
+    """
+        Elastic pool of headless Chrome drivers.
+
+        Drivers are started lazily, only when a worker asks for one and none is idle,
+        up to `size`. On checkout a driver is checked for liveness and replaced if
+        Chrome died. On release it is recycled after `max_uses` checkouts or when
+        its process tree uses more than `max_memory_mb` (needs psutil). Drivers idle
+        for longer than `idle_timeout` seconds are shut down, keeping `min_size`;
+        this is checked on every checkout and release.
+
+        Example usage:
+            with pool.driver() as driver:
+                driver.get(url)
+    """
+
+    def __init__(self, size, driver_options, min_size=0, max_uses=50, max_memory_mb=MAX_DRIVER_MEMORY_MB,
+                 idle_timeout=300, acquire_timeout=60):
         self.size = size
         self.driver_options = driver_options
-        self.pool = queue.Queue(maxsize=size)
-        self._initialize_pool()
+        self.min_size = min_size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = []
+        self._info = {}
+        self._total = 0
+        self._closed = False
+        self._condition = threading.Condition()
 
-    def _initialize_pool(self):
-        for _ in range(self.size):
-            driver = webdriver.Chrome(options=self.driver_options)
-            self.pool.put(driver)
+        self.created = 0
+        self.recycled = 0
+        self.discarded = 0
+        self.acquisitions = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
 
-    def get_driver(self):
+    def _create_driver(self):
+        driver = webdriver.Chrome(options=self.driver_options)
+        with self._condition:
+            self._info[id(driver)] = _DriverInfo()
+            self.created += 1
+        return driver
+
+    def _quit(self, driver, counter=None):
+        with self._condition:
+            if counter:
+                setattr(self, counter, getattr(self, counter) + 1)
+            self._info.pop(id(driver), None)
+            self._total -= 1
+            self._condition.notify()
         try:
-            return self.pool.get()  # Wait for up to 5 seconds for a driver
-        except queue.Empty:
-            raise Exception("No available driver in the pool. Please wait or increase the pool size.")
+            driver.quit()
+        except Exception as e:
+            print(f"Could not quit driver: {e}")
+
+    def _is_alive(self, driver):
+        # A dead chromedriver raises urllib3/connection errors, not only WebDriverException
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _memory_mb(self, driver):
+        if psutil is None:
+            return None
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / 1024 / 1024
+        except (AttributeError, psutil.Error):
+            return None
+
+    def _shrink_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._condition:
+            while len(self._idle) > self.min_size:
+                oldest = self._idle[0]
+                if now - self._info[id(oldest)].last_used < self.idle_timeout:
+                    break
+                expired.append(self._idle.pop(0))
+        for driver in expired:
+            self._quit(driver)
+
+    def get_driver(self, timeout=None):
+        """
+            Checks out a live driver, starting one if none is idle and the pool isn't full.
+            Raises DriverPoolTimeout if none becomes available within `timeout` seconds,
+            DriverPoolClosed once close_all() has been called.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        self._shrink_idle()
+
+        while True:
+            driver = None
+            with self._condition:
+                while not self._closed and not self._idle and self._total >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DriverPoolTimeout("No available driver in the pool. Please wait or increase the pool size.")
+                    self._condition.wait(remaining)
+
+                if self._closed:
+                    raise DriverPoolClosed("The driver pool is closed.")
+                if self._idle:
+                    # Most recently used first, so the others can idle out
+                    driver = self._idle.pop()
+                else:
+                    self._total += 1
+
+            if driver is None:
+                try:
+                    driver = self._create_driver()
+                except Exception:
+                    with self._condition:
+                        self._total -= 1
+                        self._condition.notify()
+                    raise
+            elif not self._is_alive(driver):
+                self._quit(driver, 'discarded')
+                continue
+
+            waited = time.monotonic() - started
+            with self._condition:
+                self.acquisitions += 1
+                self.wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+                self._info[id(driver)].uses += 1
+            return driver
 
     def release_driver(self, driver):
-        if driver:
-            self.pool.put(driver)
+        if not driver:
+            return
+        info = self._info.get(id(driver))
+        if info is None:
+            return
+
+        memory = self._memory_mb(driver) if self.max_memory_mb else None
+        if self._closed or info.uses >= self.max_uses or (memory is not None and memory > self.max_memory_mb):
+            self._quit(driver, None if self._closed else 'recycled')
+        else:
+            with self._condition:
+                info.last_used = time.monotonic()
+                self._idle.append(driver)
+                self._condition.notify()
+        # Also here, so drivers idle out while the pool is only giving drivers back
+        self._shrink_idle()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.get_driver(timeout)
+        try:
+            yield driver
+        finally:
+            self.release_driver(driver)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'in_use': self._total - len(self._idle),
+                'idle': len(self._idle),
+                'size': self.size,
+                'created': self.created,
+                'recycled': self.recycled,
+                'discarded': self.discarded,
+                'acquisitions': self.acquisitions,
+                'wait_time': self.wait_time,
+                'max_wait_time': self.max_wait_time,
+            }
 
     def close_all(self):
-        while not self.pool.empty():
-            driver = self.pool.get()
-            driver.quit()
\ No newline at end of file
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for driver in idle:
+            self._quit(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close_all()
@@ -0,0 +1,202 @@
+import json
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+
+class AnalysisTimeout(Exception):
+    pass
+
+
+class AnalysisUnavailable(Exception):
+    pass
+
+
+def _share_bars(bars):
+    """
+        Copies a bars frame into a shared memory block: the dates as int64 days, then
+        one float64 row per column. Returns the block and what is needed to read it back.
+    """
+    import numpy as np
+
+    days = bars.index.values.astype('datetime64[D]').astype(np.int64)
+    values = bars.to_numpy(dtype=np.float64).T
+    block = shared_memory.SharedMemory(create=True, size=max(1, days.nbytes + values.nbytes))
+    np.ndarray(days.shape, np.int64, block.buf)[:] = days
+    np.ndarray(values.shape, np.float64, block.buf, offset=days.nbytes)[:] = values
+    return block, (block.name, len(days), list(bars.columns))
+
+
+def _read_shared_bars(name, rows, columns):
+    import numpy as np
+    import pandas as pd
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        days = np.ndarray((rows,), np.int64, block.buf).copy()
+        values = np.ndarray((len(columns), rows), np.float64, block.buf, offset=days.nbytes).copy()
+    finally:
+        block.close()
+    index = pd.DatetimeIndex(days.astype('datetime64[D]').astype('datetime64[ns]'), name='date')
+    return pd.DataFrame(dict(zip(columns, values)), index=index)
+
+
+def _render(code, timeframe, bars, args):
+    from Classifiers.model import bars_payload
+
+    payload = bars_payload(code, timeframe, bars, *args)
+    return payload['total'], json.dumps(payload, separators=(',', ':'))
+
+
+def _render_shared(code, timeframe, shared, args):
+    # Runs in a pool process
+    return _render(code, timeframe, _read_shared_bars(*shared), args)
+
+
+class AnalysisPool:
+    """
+        Builds chart payloads in worker processes, so requests don't take turns on
+        the GIL of the web process.
+
+        The bars are read from the database on the request thread and handed to a
+        worker through shared memory, which only copies the columns instead of
+        pickling a DataFrame. The worker computes the indicators, downsamples and
+        serializes the payload, and returns (total, JSON body).
+
+        Requests for a key that is already being computed wait for that computation
+        instead of starting their own. A request gives up after `timeout` seconds with
+        AnalysisTimeout, including the time spent waiting for a free slot; at most
+        `max_pending` computations are queued or running. With workers=0 the payload
+        is built on the request thread.
+
+        If a worker process dies (e.g. killed for memory) the broken pool is replaced
+        and the chart computed once more; AnalysisUnavailable if that fails too.
+
+        Example usage:
+            total, body = pool.ohlcv(('ALKB', 'D', None, None, 1000, 14, 14, version))
+    """
+
+    def __init__(self, workers=2, timeout=30.0, max_pending=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.computed = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._in_flight = {}
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, workers) * 4)
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use, so gunicorn workers each start their own after forking
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _discard_executor(self, executor):
+        # Only the broken one, another thread may already have started its replacement
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, code, timeframe, args):
+        # The analytics stack is imported by the first chart, not when the app starts
+        from Classifiers.model import load_bars
+
+        bars = load_bars(code, timeframe)
+        if self.workers == 0:
+            return _render(code, timeframe, bars, args)
+
+        try:
+            return self._render_in_pool(code, timeframe, bars, args)
+        except BrokenProcessPool:
+            try:
+                return self._render_in_pool(code, timeframe, bars, args)
+            except BrokenProcessPool as e:
+                raise AnalysisUnavailable("the chart workers keep failing") from e
+
+    def _render_in_pool(self, code, timeframe, bars, args):
+        executor = self._get_executor()
+        block, shared = _share_bars(bars)
+        try:
+            future = executor.submit(_render_shared, code, timeframe, shared, args)
+        except Exception as e:
+            block.close()
+            block.unlink()
+            if isinstance(e, BrokenProcessPool):
+                self._discard_executor(executor)
+            raise
+
+        def release(_):
+            # Only after the worker is done with it, even if the request timed out
+            block.close()
+            block.unlink()
+        future.add_done_callback(release)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def _compute(self, key, future):
+        code, timeframe, *args = key[:-1]
+        try:
+            if not self._slots.acquire(timeout=self.timeout):
+                raise AnalysisTimeout("too many charts are being computed")
+            try:
+                future.set_result(self._submit(code, timeframe, args))
+            finally:
+                self._slots.release()
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def ohlcv(self, key):
+        """
+            Returns (total, JSON body) for a key of
+            (code, timeframe, start, end, max_points, window_sma, window_ema, data_version).
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                self.computed += 1
+            else:
+                self.coalesced += 1
+
+        if owner:
+            threading.Thread(target=self._compute, args=(key, future), daemon=True).start()
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise AnalysisTimeout(f"chart for {key[0]} took longer than {self.timeout}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'in_flight': len(self._in_flight),
+                'computed': self.computed,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+            }
+
+    def close(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
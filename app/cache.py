@@ -0,0 +1,71 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class AnalysisCache:
+    """
+        LRU cache for analysis results, bounded by the memory its values take.
+
+        Keys are tuples starting with the company code, e.g.
+        (company_code, timeframe, start, end, max_points, window_sma, window_ema).
+        Every entry remembers the company's data version it was built from; a lookup
+        with a newer version is a miss, so writes from another process (the scraper)
+        are picked up too.
+        invalidate(code) drops a company's entries right away for writes in this process.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, value):
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, code):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == code]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -1,9 +1,67 @@
-from flask import Flask, render_template, request
-from Classifiers.model import prepare_data, calculate_sma_ema, plot_data
-from Data.db_functions import get_company_data_by_code, get_all_company_codes
+import math
+import os
+import time
+from datetime import datetime
+
+from flask import Flask, render_template, request, jsonify, g
+from Data.db_functions import get_all_company_codes, get_data_version, add_data_listener
+from Data.engine import get_engine
+from Data.migrations import upgrade
+from app.cache import AnalysisCache
+from app.analysis_pool import AnalysisPool, AnalysisTimeout, AnalysisUnavailable
+from Metrics import metrics, to_prometheus, run_summary_snapshot, read_run_summary
 
 app = Flask(__name__)
 
+TIMEFRAME_NAMES = {'D': 'Daily', 'W': 'Weekly', 'M': 'Monthly'}
+
+# Upper bound for max_points, keeps chart payloads small whatever the history length
+MAX_CHART_POINTS = 5000
+
+# Longest SMA/EMA window a chart can ask for, ten years of daily bars
+MAX_INDICATOR_WINDOW = 2500
+
+# Chart payloads, bounded by ANALYSIS_CACHE_MB and dropped when a company gets new data
+analysis_cache = AnalysisCache(int(os.environ.get('ANALYSIS_CACHE_MB', 128)) * 1024 * 1024)
+add_data_listener(analysis_cache.invalidate)
+
+# Chart payloads are computed in ANALYSIS_WORKERS processes (0 computes them on the
+# request thread, the default under gunicorn) and a request waits at most
+# ANALYSIS_TIMEOUT seconds for one
+analysis_pool = AnalysisPool(int(os.environ.get('ANALYSIS_WORKERS', min(4, os.cpu_count() or 1))),
+                             float(os.environ.get('ANALYSIS_TIMEOUT', 30)))
+
+def number_arg(name, default=None, type=int, minimum=None, maximum=None):
+    """
+        Query parameter as a number, the default if it's missing. Raises ValueError with
+        a message for the client if it is not a finite number within [minimum, maximum].
+    """
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        number = type(value)
+    except ValueError:
+        raise ValueError(f"{name} must be {'a whole number' if type is int else 'a number'}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    if maximum is not None and number > maximum:
+        raise ValueError(f"{name} must be at most {maximum}")
+    return number
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    metrics.increment('http_requests_total', endpoint=endpoint, status=response.status_code)
+    metrics.observe('http_request_seconds', time.perf_counter() - g.request_started, endpoint=endpoint)
+    return response
+
 @app.route('/', methods=['GET'])
 def home():
     return render_template('index.html')
@@ -16,19 +74,117 @@ def company_selector():
 
 @app.route('/analyze', methods=['POST','GET'])
 def analyze():
-    company_code = request.form.get('company_code')
-    data = get_company_data_by_code(company_code)
-    data_dict = prepare_data(data)
-    _, _, monthly_data = data_dict
+    # The page only carries the parameters, the chart data comes from /api/ohlcv
+    company_code = request.values.get('company_code')
+    timeframe = request.values.get('timeframe', 'M')
+    if timeframe not in TIMEFRAME_NAMES:
+        timeframe = 'M'
+    window_sma = request.values.get('window_sma', 14, type=int)
+    window_ema = request.values.get('window_ema', 14, type=int)
+    return render_template('dashboard.html', company_code=company_code, timeframe=timeframe,
+                           timeframe_name=TIMEFRAME_NAMES[timeframe],
+                           window_sma=window_sma, window_ema=window_ema)
+
+@app.route('/api/ohlcv/<code>', methods=['GET'])
+def api_ohlcv(code):
+    """
+        Chart data as columnar arrays, downsampled to at most max_points candles, e.g.
+        /api/ohlcv/ALKB?tf=W&from=2020-01-01&to=2024-12-31&max_points=500
+    """
+    timeframe = request.args.get('tf', 'M')
+    if timeframe not in TIMEFRAME_NAMES:
+        return jsonify({'error': f"Unknown timeframe: {timeframe}"}), 400
+    start, end = request.args.get('from'), request.args.get('to')
+    try:
+        for value in (start, end):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': "from and to must be YYYY-MM-DD dates"}), 400
+    max_points = min(max(request.args.get('max_points', 1000, type=int), 10), MAX_CHART_POINTS)
+    try:
+        window_sma = number_arg('window_sma', 14, minimum=1, maximum=MAX_INDICATOR_WINDOW)
+        window_ema = number_arg('window_ema', 14, minimum=1, maximum=MAX_INDICATOR_WINDOW)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cache_key = (code, timeframe, start, end, max_points, window_sma, window_ema)
+    version = get_data_version(code)
+    body = analysis_cache.get(cache_key, version)
+
+    if body is None:
+        # Identical requests arriving together share one computation
+        try:
+            total, body = analysis_pool.ohlcv((code, timeframe, start or None, end or None,
+                                               max_points, window_sma, window_ema, version))
+        except AnalysisTimeout as e:
+            return jsonify({'error': f"Timed out: {e}"}), 504
+        except AnalysisUnavailable as e:
+            return jsonify({'error': f"Charts are unavailable: {e}"}), 503
+        if total == 0:
+            return jsonify({'error': f"No data found for {code}."}), 404
+        analysis_cache.put(cache_key, version, body)
+
+    return app.response_class(body, mimetype='application/json')
+
+@app.route('/screener', methods=['GET'])
+def screener():
+    """
+        Latest figures for every issuer, e.g.
+        /screener?sort=volume&order=desc&min_rsi_14=30&max_rsi_14=70&limit=20
+    """
+    from Classifiers.screener import screen_market, SCREENER_FIELDS
+
+    sort_by = request.args.get('sort', 'percent_change')
+    if sort_by not in SCREENER_FIELDS and sort_by != 'code':
+        return jsonify({'error': f"Unknown sort field: {sort_by}"}), 400
+
+    filters = {}
+    try:
+        for field in SCREENER_FIELDS:
+            minimum = number_arg(f'min_{field}', type=float)
+            maximum = number_arg(f'max_{field}', type=float)
+            if minimum is not None or maximum is not None:
+                filters[field] = (minimum, maximum)
+        limit = number_arg('limit', minimum=0)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = screen_market(sort_by=sort_by,
+                            descending=request.args.get('order', 'desc') != 'asc',
+                            filters=filters,
+                            limit=limit)
+    return jsonify(results)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(analysis_cache.stats())
 
-    # Add SMA and EMA calculations
-    monthly_with_indicators = calculate_sma_ema(monthly_data)
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+        Prometheus text format: this process's request, cache and pool metrics, followed by
+        the summary of the last scrape run (written by main.py) as last_run_* gauges
+        and the stage, fetch scheduler, scraper and database metrics it recorded.
+    """
+    for name, value in analysis_cache.stats().items():
+        metrics.set_gauge(f'analysis_cache_{name}', value)
+    for name, value in analysis_pool.stats().items():
+        metrics.set_gauge(f'analysis_pool_{name}', value)
+    body = to_prometheus(metrics.snapshot())
 
-    # Generate Plotly graph
-    fig = plot_data(monthly_with_indicators, f"Monthly Data for {company_code} with SMA & EMA")
-    graph_html = fig.to_html(full_html=False)
+    summary = read_run_summary()
+    if summary is not None:
+        body += to_prometheus(run_summary_snapshot(summary))
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
 
-    return render_template('dashboard.html', company_code=company_code, graph_html=graph_html)
+@app.route('/metrics/last_run', methods=['GET'])
+def last_run():
+    summary = read_run_summary()
+    if summary is None:
+        return jsonify({'error': "No scrape run recorded yet."}), 404
+    return jsonify(summary)
 
 if __name__ == '__main__':
+    upgrade(get_engine())
     app.run(host='0.0.0.0', port=8050, debug=True)
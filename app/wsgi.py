@@ -0,0 +1,30 @@
+"""
+WSGI entry point for serving the dashboard with several worker processes.
+
+Imported once in the gunicorn master when preload_app is on (see gunicorn.conf.py),
+so pandas, the analytics modules, the Flask app and the compiled templates are
+loaded before the workers fork and are shared between them copy-on-write. The
+database is migrated here once instead of in every worker.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.wsgi:application
+"""
+import importlib
+
+from Data.engine import get_engine
+from Data.migrations import upgrade
+from app.server import app
+
+# The app imports these on first use; loading them here shares them with every worker
+PRELOAD_MODULES = ('numpy', 'pandas', 'Classifiers.model', 'Classifiers.screener')
+
+upgrade(get_engine())
+
+for module in PRELOAD_MODULES:
+    importlib.import_module(module)
+
+# Jinja compiles templates on first use, per process; compiling them here shares the result
+for template in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template)
+
+application = app
@@ -0,0 +1,80 @@
+"""
+Benchmark for loading the whole market: SQLite versus the Parquet archive.
+
+Compares the three ways to get every issuer's history into pandas:
+
+    orm loop : get_company_data_by_code for every company, the way analysts did it
+    sql      : get_price_matrix, one Core query pivoted in pandas
+    archive  : Classifiers.market_data reading the Parquet archive
+
+and reports the time of a full and of a no-op incremental archive sync, and the
+size of the archive next to the SQLite file. The archive is written to a
+temporary directory, the database is only read.
+
+Usage:
+    python -m benchmarks.bench_archive [--db path/to/database.db] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import Data.db_functions as db_functions
+from Classifiers.market_data import load_market, load_market_matrix
+from Data.archive import sync_archive, archive_size
+from Data.engine import DB_PATH, create_sqlite_engine, set_engine
+
+
+def orm_loop(codes):
+    frames = []
+    for code in codes:
+        records = db_functions.get_company_data_by_code(code) or []
+        frames.append(pd.DataFrame([{'code': record.code, 'date': record.date,
+                                     **{column: getattr(record, column) for column in db_functions.FRAME_COLUMNS}}
+                                    for record in records]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = set_engine(create_sqlite_engine(args.db))
+    with tempfile.TemporaryDirectory() as archive:
+        synced = sync_archive(engine, archive)
+        if synced is None:
+            raise SystemExit("The archive could not be written")
+        print(f"full sync      : {synced['rows']:>8} rows, {synced['written']} partitions in {synced['seconds']:7.2f}s")
+        synced = sync_archive(engine, archive)
+        print(f"no-op sync     : {synced['seconds']:7.3f}s")
+
+        # Synthetic databases have history but no Companies rows
+        codes = db_functions.get_all_company_codes() or list(db_functions.get_trading_dates_by_code())
+        seconds, market = best_of(lambda: orm_loop(codes), 1)
+        print(f"orm loop       : {len(market):>8} rows in {seconds:7.3f}s")
+        seconds, _ = best_of(db_functions.get_price_matrix, args.repeat)
+        print(f"sql matrix     : {'':>8}      in {seconds:7.3f}s")
+        seconds, market = best_of(lambda: load_market(path=archive), args.repeat)
+        print(f"archive long   : {len(market):>8} rows in {seconds:7.3f}s")
+        seconds, _ = best_of(lambda: load_market_matrix(path=archive), args.repeat)
+        print(f"archive matrix : {'':>8}      in {seconds:7.3f}s")
+
+        print(f"size           : SQLite {os.path.getsize(args.db) / 1e6:.1f} MB, "
+              f"archive {archive_size(archive) / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
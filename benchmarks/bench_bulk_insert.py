@@ -0,0 +1,101 @@
+"""
+Benchmark for the CompanyData ingestion path.
+
+Builds a synthetic 10-year history for ~150 issuers and measures rows/sec for the
+old per-row path (insert_company_data_object, one commit per row) and for the
+bulk path (insert_company_data_bulk, one transaction per year window).
+
+The per-row path is measured on a sample of issuers because a full run takes
+hours on a disk with real fsync.
+
+Usage:
+    python -m benchmarks.bench_bulk_insert [--issuers 150] [--years 10] [--row-sample-issuers 2]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import Data.db_functions as db_functions
+from Data.engine import create_sqlite_engine, set_engine
+from Models import CompanyData
+from Models.models_base import Base
+
+
+def synthetic_windows(issuers, years):
+    """
+        Yields (code, rows) for every issuer and year window, one row per weekday.
+    """
+    end_year = date.today().year
+    for n in range(issuers):
+        code = f"SYN{n:03d}"
+        price = 100.0 + n
+        for year in range(end_year - years, end_year):
+            rows = []
+            day = date(year, 1, 1)
+            while day.year == year:
+                if day.weekday() < 5:
+                    price = max(1.0, price * (1 + ((day.toordinal() * 7 + n) % 11 - 5) / 1000))
+                    rows.append({
+                        'code': code,
+                        'date': day,
+                        'last_trade_price': price,
+                        'max_price': price * 1.01,
+                        'min_price': price * 0.99,
+                        'avg_price': price,
+                        'percent_change': 0.5,
+                        'volume': 100 + n,
+                        'turnover_best_denars': price * 100,
+                        'total_turnover_denars': price * 100
+                    })
+                day += timedelta(days=1)
+            yield code, rows
+
+
+def use_database(path):
+    engine = create_sqlite_engine(path)
+    Base.metadata.create_all(engine)
+    set_engine(engine)
+    return engine
+
+
+def bench_per_row(windows):
+    count = 0
+    start = time.perf_counter()
+    for _, rows in windows:
+        for row in rows:
+            db_functions.insert_company_data_object(CompanyData(**row))
+            count += 1
+    return count, time.perf_counter() - start
+
+
+def bench_bulk(windows):
+    count = 0
+    start = time.perf_counter()
+    for _, rows in windows:
+        count += db_functions.insert_company_data_bulk(rows) or 0
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issuers', type=int, default=150)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--row-sample-issuers', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database(os.path.join(tmp, 'per_row.db'))
+        rows, seconds = bench_per_row(synthetic_windows(args.row_sample_issuers, args.years))
+        print(f"per-row : {rows:>8} rows in {seconds:8.2f}s -> {rows / seconds:10.0f} rows/sec "
+              f"({args.row_sample_issuers} issuers sampled)")
+
+        use_database(os.path.join(tmp, 'bulk.db'))
+        rows, seconds = bench_bulk(synthetic_windows(args.issuers, args.years))
+        print(f"bulk    : {rows:>8} rows in {seconds:8.2f}s -> {rows / seconds:10.0f} rows/sec "
+              f"({args.issuers} issuers)")
+
+
+if __name__ == '__main__':
+    main()
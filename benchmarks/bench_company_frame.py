@@ -0,0 +1,77 @@
+"""
+Benchmark for reading one issuer's 10-year history into a DataFrame.
+
+Compares the ORM path (get_company_data_by_code -> list of dicts -> DataFrame)
+with get_company_frame (Core select -> typed NumPy columns), reporting latency
+and peak Python memory (tracemalloc) for each.
+
+Usage:
+    python -m benchmarks.bench_company_frame [--years 10] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import Data.db_functions as db_functions
+from benchmarks.bench_bulk_insert import synthetic_windows, use_database
+
+
+def orm_frame(code):
+    rows = []
+    for company_data in db_functions.get_company_data_by_code(code):
+        rows.append({
+            'date': company_data.date,
+            'last_trade_price': company_data.last_trade_price,
+            'max_price': company_data.max_price,
+            'min_price': company_data.min_price,
+            'avg_price': company_data.avg_price,
+            'percent_change': company_data.percent_change,
+            'volume': company_data.volume,
+            'turnover_best_denars': company_data.turnover_best_denars,
+            'total_turnover_denars': company_data.total_turnover_denars
+        })
+    df = pd.DataFrame(rows)
+    df['date'] = pd.to_datetime(df['date'])
+    return df.set_index('date')
+
+
+def core_frame(code):
+    return db_functions.get_company_frame(code)
+
+
+def measure(read, code, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read(code)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    df = read(code)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database(os.path.join(tmp, 'frame.db'))
+        for code, rows in synthetic_windows(1, args.years):
+            db_functions.insert_company_data_bulk(rows)
+
+        for name, read in (('orm ', orm_frame), ('core', core_frame)):
+            seconds, peak, rows = measure(read, 'SYN000', args.repeat)
+            print(f"{name}: {rows} rows in {seconds * 1000:8.1f} ms, peak memory {peak / 1024 / 1024:6.2f} MiB")
+
+
+if __name__ == '__main__':
+    main()
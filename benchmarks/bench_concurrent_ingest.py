@@ -0,0 +1,93 @@
+"""
+Stress test for concurrent ingest, the way the scraper writes.
+
+Many worker threads write year windows with insert_company_data_bulk while a reader
+thread keeps loading company frames like the dashboard does. Runs three setups:
+
+    default : plain create_engine, rollback journal, every thread writes directly
+    tuned   : Data.engine settings (WAL, busy_timeout, ...), every thread writes directly
+    writer  : Data.engine settings, writes handed to the IngestionStage writer thread
+
+and reports rows/sec, failed windows ("database is locked") and reader queries.
+
+Usage:
+    python -m benchmarks.bench_concurrent_ingest [--issuers 60] [--years 5] [--threads 16]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+
+import Data.db_functions as db_functions
+from Data.engine import create_sqlite_engine, set_engine
+from Models.models_base import Base
+from PipeFilterSystem.ingestion import IngestionStage
+from benchmarks.bench_bulk_insert import synthetic_windows
+
+
+def use_engine(engine):
+    Base.metadata.create_all(engine)
+    set_engine(engine)
+
+
+def run(windows, threads, ingestion=None):
+    stop = threading.Event()
+    reads = [0]
+
+    def read_loop():
+        while not stop.is_set():
+            db_functions.get_company_frame('SYN000')
+            reads[0] += 1
+
+    def write(rows):
+        if ingestion is None:
+            return db_functions.insert_company_data_bulk(rows)
+        # Waits for the commit like a direct write, the batch it went into is written as one
+        written = Future()
+        ingestion.put(rows, written.set_result)
+        return written.result()
+
+    reader = threading.Thread(target=read_loop)
+    reader.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        written = list(executor.map(write, [rows for _, rows in windows]))
+    seconds = time.perf_counter() - start
+    stop.set()
+    reader.join()
+
+    failed = sum(1 for count in written if count is None)
+    rows = ingestion.rows_written if ingestion is not None else sum(count or 0 for count in written)
+    return rows, failed, seconds, reads[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issuers', type=int, default=60)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    windows = list(synthetic_windows(args.issuers, args.years))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ('default', 'tuned', 'writer'):
+            path = os.path.join(tmp, f'{name}.db')
+            engine = create_engine(f"sqlite:///{path}") if name == 'default' else create_sqlite_engine(path)
+            use_engine(engine)
+            ingestion = IngestionStage() if name == 'writer' else None
+
+            rows, failed, seconds, reads = run(windows, args.threads, ingestion)
+            if ingestion is not None:
+                ingestion.close()
+            engine.dispose()
+            print(f"{name:<8}: {rows:>8} rows in {seconds:7.2f}s -> {rows / seconds:9.0f} rows/sec, "
+                  f"{failed:>3} failed windows, {reads:>5} reader queries")
+
+
+if __name__ == '__main__':
+    main()
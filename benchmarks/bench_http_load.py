@@ -0,0 +1,97 @@
+"""
+Load test for the dashboard server.
+
+Sends requests from many concurrent clients to a running server and reports
+requests/sec, p50, p95 and max latency and failed requests for each path. Run it
+against the dev server and against gunicorn to compare, e.g.
+
+    python app/server.py
+    WEB_WORKERS=4 gunicorn -c gunicorn.conf.py app.wsgi:application
+
+The chart data of /analyze comes from /api/ohlcv/<code>, which is where the pandas
+and Plotly work happens, so it is measured alongside the page itself. Add
+--no-cache-hits to vary the query and measure cache misses instead.
+
+Usage:
+    python -m benchmarks.bench_http_load [--url http://127.0.0.1:8050] [--code ALKB]
+                                         [--clients 16] [--requests 400]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+_local = threading.local()
+
+
+def session():
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def timed_get(url):
+    started = time.perf_counter()
+    try:
+        ok = session().get(url, timeout=60).status_code < 400
+    except requests.RequestException:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def load(urls, clients, total):
+    """
+        Sends `total` requests spread over `urls` from `clients` threads.
+        Returns (seconds, latencies, failures).
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(timed_get, (urls[i % len(urls)] for i in range(total))))
+    seconds = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    return seconds, latencies, sum(1 for _, ok in results if not ok)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8050')
+    parser.add_argument('--code', default='ALKB')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--no-cache-hits', action='store_true',
+                        help="Use a different window_sma per request so every chart is computed.")
+    args = parser.parse_args()
+
+    base = args.url.rstrip('/')
+    chart = f"{base}/api/ohlcv/{args.code}?tf=D&max_points=1000"
+    paths = {
+        '/select_company': [f"{base}/select_company"],
+        '/analyze': [f"{base}/analyze?company_code={args.code}&timeframe=D"],
+        '/api/ohlcv': [f"{chart}&window_sma={5 + i}" for i in range(args.requests)]
+                      if args.no_cache_hits else [chart],
+    }
+
+    # One warm-up request per path, so imports and first queries are not measured
+    for urls in paths.values():
+        timed_get(urls[0])
+
+    print(f"{args.clients} clients, {args.requests} requests per path against {base}")
+    for path, urls in paths.items():
+        seconds, latencies, failures = load(urls, args.clients, args.requests)
+        print(f"{path:16} {args.requests / seconds:8.1f} req/s   "
+              f"p50 {percentile(latencies, 0.50) * 1000:7.1f} ms   "
+              f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms   "
+              f"max {max(latencies) * 1000:7.1f} ms   failed {failures}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark for computing every indicator for every listed issuer.
+
+Times Classifiers.indicators.compute_indicators on a synthetic (dates x issuers)
+price matrix, against a per-issuer pandas loop computing SMA, EMA, RSI, MACD and
+Bollinger bands only. With --db the whole market is also loaded from the
+configured database through market_indicators().
+
+Usage:
+    python -m benchmarks.bench_indicators [--issuers 150] [--days 2600] [--db]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from Classifiers.indicators import compute_indicators, market_indicators
+
+
+def synthetic_market(days, issuers, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (days, issuers)), axis=0))
+    spread = np.abs(rng.normal(0, 0.005, (days, issuers))) * close
+    volume = rng.integers(0, 1000, (days, issuers)).astype(np.float64)
+    # Newer listings have no history at the start
+    for column in range(0, issuers, 10):
+        close[:rng.integers(0, days // 2), column] = np.nan
+    return close, close + spread, close - spread, volume
+
+
+def pandas_loop(close):
+    for column in range(close.shape[1]):
+        series = pd.Series(close[:, column])
+        series.rolling(14).mean()
+        series.ewm(span=14, adjust=False).mean()
+        delta = series.diff()
+        gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        100 - 100 / (1 + gain / loss)
+        line = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+        line.ewm(span=9, adjust=False).mean()
+        series.rolling(20).mean() + 2 * series.rolling(20).std(ddof=0)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issuers', type=int, default=150)
+    parser.add_argument('--days', type=int, default=2600)
+    parser.add_argument('--db', action='store_true', help="Also load and compute the market from the database.")
+    args = parser.parse_args()
+
+    close, high, low, volume = synthetic_market(args.days, args.issuers)
+    print(f"{args.days} days x {args.issuers} issuers")
+    print(f"per-issuer pandas loop (5 indicators): {timed(pandas_loop, close) * 1000:8.1f} ms")
+    print(f"vectorized (all indicators)          : "
+          f"{timed(compute_indicators, close, high, low, volume) * 1000:8.1f} ms")
+
+    if args.db:
+        print(f"market_indicators() from database    : {timed(market_indicators) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Offline benchmark of a whole scrape run against the replay server.
+
+Writes a synthetic fixture store (or takes a recorded one with --fixtures), serves
+it with Scraper.fixture_server in its own process with the given latency and
+error rate, and runs main.py on an empty database once per engine and pool size.
+For every run it reports, from the run summary and the rusage of the main.py
+process:
+
+    pages/s, rows/s : throughput of the pipeline
+    first           : seconds until the first company was fully written
+    failed          : windows that still failed after the scheduler's retries
+    cpu %           : user + system CPU time of the run over its wall time
+    peak MB         : peak RSS of the scraper, for Selenium the largest process of the run
+
+Usage:
+    python -m benchmarks.bench_replay [--engines http selenium] [--pool-sizes 1 4 16]
+        [--issuers 20] [--years 10] [--latency 0.05] [--jitter 0.05] [--error-rate 0]
+        [--fixtures path/to/recorded/store]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from Metrics import read_run_summary
+from benchmarks.bench_bulk_insert import synthetic_windows
+from Scraper.row_parser import HISTORY_COLUMNS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HISTORY_PAGE = """<!DOCTYPE html>
+<html lang="mk">
+<head><meta charset="utf-8"><title>Историски податоци - {code} - Македонска берза</title></head>
+<body>
+<div class="container">
+  <form action="/mk/stats/symbolhistory/{code}" method="post">
+    <input type="text" name="FromDate" value="" class="form-control">
+    <input type="text" name="ToDate" value="" class="form-control">
+    <input type="hidden" name="Code" value="{code}">
+    <input type="submit" value="Прикажи" class="btn btn-primary-sm">
+  </form>
+  <table id="resultsTable" class="table table-bordered">
+    <tbody>
+{rows}
+    </tbody>
+  </table>
+</div>
+</body>
+</html>
+"""
+
+
+def mk_number(value, decimals=2):
+    # 18363.0 -> '18.363,00', the way the site prints numbers
+    return f"{value:,.{decimals}f}".replace(',', ' ').replace('.', ',').replace(' ', '.')
+
+
+def write_synthetic_store(directory, issuers, years):
+    """
+        Writes a free-market listing and one full history page per issuer, newest row
+        first like the site. The replay server cuts every requested window out of it.
+    """
+    os.makedirs(os.path.join(directory, 'symbolhistory'))
+    pages = {}
+    for code, rows in synthetic_windows(issuers, years):
+        pages.setdefault(code, []).extend(rows)
+
+    for code, rows in pages.items():
+        lines = []
+        for row in reversed(rows):
+            cells = [row['date'].strftime('%d.%m.%Y')]
+            cells += [mk_number(row[column], 0 if column == 'volume' else 2) for column in HISTORY_COLUMNS]
+            lines.append('      <tr>' + ''.join(f"<td>{cell}</td>" for cell in cells) + '</tr>')
+        with open(os.path.join(directory, 'symbolhistory', f"{code}.html"), 'w', encoding='utf-8') as file:
+            file.write(HISTORY_PAGE.format(code=code, rows='\n'.join(lines)))
+
+    listing = '\n'.join(f"<tr><td>{code}</td><td>Synthetic {code}</td></tr>" for code in pages)
+    with open(os.path.join(directory, 'free-market.html'), 'w', encoding='utf-8') as file:
+        file.write(f'<html><body><table class="table"><tbody>\n{listing}\n</tbody></table></body></html>\n')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(fixtures, args):
+    port = free_port()
+    command = [sys.executable, '-m', 'Scraper.fixture_server', '--fixtures', fixtures, '--port', str(port),
+               '--latency', str(args.latency), '--jitter', str(args.jitter),
+               '--error-rate', str(args.error_rate), '--seed', str(args.seed)]
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return server, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise SystemExit("The replay server did not start")
+
+
+def counter(summary, name, **labels):
+    return sum(item['value'] for item in summary['metrics']['counters']
+               if item['name'] == name and labels.items() <= item['labels'].items())
+
+
+def run(engine, pool_size, url, args):
+    """
+        Runs main.py on a fresh database and returns (run summary, wall seconds, rusage),
+        or (None, the error it reported, None) if it failed.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        summary_path = os.path.join(tmp, 'last_run.json')
+        env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, 'database.db'), RUN_SUMMARY_PATH=summary_path)
+        command = [sys.executable, '-W', 'ignore', 'main.py', '--engine', engine, '--base-url', url,
+                   '--pool-size', str(pool_size), '--rps', str(args.rps), '--no-archive']
+        if args.max_window_days:
+            command += ['--max-window-days', str(args.max_window_days)]
+
+        with open(os.path.join(tmp, 'run.log'), 'w+') as log:
+            started = time.perf_counter()
+            process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+            # wait4 gives the CPU time and peak memory of this run alone, children included
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            seconds = time.perf_counter() - started
+            log.seek(0)
+            lines = log.read().strip().splitlines() or ['no output']
+
+        summary = read_run_summary(summary_path)
+        if process.returncode != 0 or summary is None:
+            return None, f"exit code {process.returncode}: {lines[-1]}", None
+        # A stage that fails (e.g. no Chrome for Selenium) is logged and the run still exits cleanly
+        if not summary['companies_loaded'] and any(stage['errors'] for stage in summary['stages'].values()):
+            return None, next((line for line in lines if line.startswith('Stage ')), lines[-1]), None
+        return summary, seconds, usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='+', default=['http', 'selenium'])
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--issuers', type=int, default=20)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--fixtures', help="Recorded fixture store to replay instead of synthetic pages.")
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rps', type=float, default=0, help="Request rate limit of the scraper, 0 for none.")
+    parser.add_argument('--max-window-days', type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as store:
+        fixtures = args.fixtures
+        if fixtures is None:
+            fixtures = os.path.join(store, 'fixtures')
+            write_synthetic_store(fixtures, args.issuers, args.years)
+        print(f"Replaying {fixtures}: latency {args.latency}s + up to {args.jitter}s, error rate {args.error_rate}")
+        print(f"{'engine':<9}{'pool':>5}{'companies':>10}{'pages':>7}{'failed':>7}{'wall s':>8}"
+              f"{'pages/s':>9}{'rows/s':>9}{'first s':>9}{'cpu %':>7}{'peak MB':>9}")
+        for engine in args.engines:
+            for pool_size in args.pool_sizes:
+                # A fresh server for every run, so each one draws the same latencies and errors
+                server, url = start_server(fixtures, args)
+                try:
+                    summary, seconds, usage = run(engine, pool_size, url, args)
+                finally:
+                    server.terminate()
+                    server.wait()
+                if summary is None:
+                    print(f"{engine:<9}{pool_size:>5}  failed with {seconds}")
+                    continue
+                duration = summary['duration_seconds'] or 1e-9
+                first = summary['first_company_seconds']
+                pages = counter(summary, 'scraper_pages_total')
+                cpu = usage.ru_utime + usage.ru_stime
+                print(f"{engine:<9}{pool_size:>5}{summary['companies_loaded']:>10}{pages:>7}"
+                      f"{counter(summary, 'scraper_failures_total', reason='retries_exhausted'):>7}{seconds:>8.2f}{pages / duration:>9.1f}"
+                      f"{summary['rows_written'] / duration:>9.0f}{first if first is not None else float('nan'):>9.2f}"
+                      f"{100 * cpu / seconds:>7.0f}{usage.ru_maxrss / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for parsing MSE history tables.
+
+Parses the saved pages in Scraper/fixtures/parser with TableRowParser and compares
+the old per-cell conversion (strptime and chained str.replace for every cell) with
+Scraper.row_parser, which converts the whole table with NumPy string operations.
+Also checks that both give the same records and how the edge case pages are handled.
+
+Usage:
+    python -m benchmarks.bench_row_parser [--repeat 200]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+from Scraper.http_scraper import TableRowParser, HISTORY_TABLE_ID
+from Scraper.row_parser import parse_history_table, history_records, TableParseError, HISTORY_COLUMNS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Scraper', 'fixtures', 'parser')
+
+
+def load_page(name):
+    parser = TableRowParser(HISTORY_TABLE_ID)
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as file:
+        parser.feed(file.read())
+    parser.close()
+    return parser.rows
+
+
+def convert_str_to_float(string):
+    return 0 if string is None else float(string.replace(".", "").replace(",", ".") if string != '' else 0)
+
+
+def per_cell_records(code, table_rows):
+    rows = []
+    for cells in table_rows:
+        try:
+            trading_date = datetime.strptime(cells[0], '%d.%m.%Y').date()
+        except ValueError:
+            continue
+        rows.append({'code': code, 'date': trading_date,
+                     **{column: convert_str_to_float(cell) for column, cell in zip(HISTORY_COLUMNS, cells[1:])}})
+    return rows
+
+
+def vectorized_records(code, table_rows):
+    return history_records(code, parse_history_table(table_rows))
+
+
+def measure(parse, table_rows, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse('ALKB', table_rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    table_rows = load_page('year.html')
+    if per_cell_records('ALKB', table_rows) != vectorized_records('ALKB', table_rows):
+        raise SystemExit("The parsers disagree on year.html")
+
+    for name, parse in (('per-cell  ', per_cell_records), ('vectorized', vectorized_records)):
+        seconds = measure(parse, table_rows, args.repeat)
+        print(f"{name}: {len(table_rows)} rows in {seconds * 1000:7.3f} ms -> {len(table_rows) / seconds:10.0f} rows/sec")
+
+    for name in ('extra_cells.html', 'partial_row.html', 'empty.html'):
+        try:
+            print(f"{name}: {len(parse_history_table(load_page(name)))} rows")
+        except TableParseError as e:
+            print(f"{name}: rejected, {e}")
+
+
+if __name__ == '__main__':
+    main()
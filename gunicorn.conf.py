@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for the dashboard, see app/wsgi.py.
+
+The worker count and threads come from WEB_WORKERS and WEB_THREADS. Chart requests
+spend most of their time in pandas, which holds the GIL, so throughput scales with
+processes; the threads only cover requests waiting on SQLite or the network.
+
+The workers already spread the charts over the CPUs, so each worker computes them
+on its request threads: ANALYSIS_WORKERS defaults to 0 here instead of a process
+pool per worker, which would run workers * pool size processes on the same CPUs.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8050)}"
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 2))
+# Read by app/server.py, which the master imports after this file
+os.environ.setdefault('ANALYSIS_WORKERS', '0')
+worker_class = 'gthread'
+
+# Load the app in the master before forking, see app/wsgi.py
+preload_app = True
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then, so a slow leak in pandas or Plotly can't grow forever
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # SQLite connections opened by the master must not be used by the children
+    from Data.engine import engine, SessionLocal
+    SessionLocal.remove()
+    engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # Stop the chart processes of this worker, see app/analysis_pool.py
+    from app.server import analysis_pool
+    analysis_pool.close()
@@ -1,46 +1,80 @@
-from Data.db_functions import delete_data_for_unfinished_companies
-from PipeFilterSystem import PipeFilterSystem, CompanyFilter, CodeFilter
+from Data.engine import get_engine
+from Data.migrations import upgrade
+from PipeFilterSystem import PipeFilterSystem, CompanyFilter, CodeFilter, IngestionStage
+from PipeFilterSystem.PipeFilterSystem import ENGINES
+from Scraper.selenium_scraper import MSE_BASE_URL
+from Scraper.sync_planner import MAX_WINDOW_DAYS, ROW_CAP
+from Metrics.startup import print_import_profile
+from Data.archive import sync_archive
+import argparse
 import signal
 import sys
 import atexit
 
 
-def cleanup_and_exit(signum = None, frame = None):
-    """
-    Cleanup logic when the application is stopping.
-    """
-    print("Cleaning up before exiting...")
-    delete_data_for_unfinished_companies()  # Call the cleanup function
+parser = argparse.ArgumentParser(description="Scrape the Macedonian Stock Exchange into the local database.")
+parser.add_argument('--engine', choices=ENGINES, default='selenium',
+                    help="Scraper engine: headless Chrome or plain HTTP requests.")
+parser.add_argument('--base-url', default=MSE_BASE_URL,
+                    help="Site to scrape, e.g. a local fixture server for offline runs.")
+parser.add_argument('--rps', type=float, default=4.0,
+                    help="Maximum requests per second sent to the site.")
+parser.add_argument('--pool-size', type=int, default=None,
+                    help="Browsers or HTTP sessions used in parallel, cpu count + 4 (at most 32) by default.")
+parser.add_argument('--max-window-days', type=int, default=MAX_WINDOW_DAYS,
+                    help="Longest date range requested in one page.")
+parser.add_argument('--row-cap', type=int, default=ROW_CAP,
+                    help="Rows after which a page is taken as cut off and its range is split.")
+parser.add_argument('--no-archive', action='store_true',
+                    help="Skip updating the Parquet archive (Data/archive) after the run.")
+parser.add_argument('--profile-startup', action='store_true',
+                    help="Report the import time of every module the scraper and the app load, then exit.")
 
-atexit.register(cleanup_and_exit)
 
-# Register the signal handlers
-signal.signal(signal.SIGINT, cleanup_and_exit)  # Handle Ctrl+C
-signal.signal(signal.SIGTERM, cleanup_and_exit)  # Handle termination signal
+def main():
+    args = parser.parse_args()
 
+    if args.profile_startup:
+        print_import_profile()
+        return
 
+    # Scraped rows are queued here and written by a single writer thread
+    ingestion = IngestionStage()
 
+    def cleanup_and_exit(signum=None, frame=None):
+        """
+        Cleanup logic when the application is stopping.
+        """
+        print("Cleaning up before exiting...")
+        # Write the rows that are still queued. Windows that were not written have no
+        # checkpoint and are fetched again on the next run, so nothing has to be deleted.
+        ingestion.close()
+        if signum is not None:
+            sys.exit(128 + signum)
 
-code_filter = CodeFilter()
-company_filter = CompanyFilter(code_filter)
-pipe_filter = PipeFilterSystem([code_filter, company_filter])
+    atexit.register(cleanup_and_exit)
 
-pipe_filter.filter_data()
+    # Register the signal handlers
+    signal.signal(signal.SIGINT, cleanup_and_exit)  # Handle Ctrl+C
+    signal.signal(signal.SIGTERM, cleanup_and_exit)  # Handle termination signal
 
+    # The scraper upserts on (code, date), so older databases need the unique index first
+    upgrade(get_engine())
 
+    code_filter = CodeFilter(max_window_days=args.max_window_days, row_cap=args.row_cap)
+    company_filter = CompanyFilter(code_filter, requests_per_second=args.rps, ingestion=ingestion)
+    pipe_filter = PipeFilterSystem([code_filter, company_filter], engine=args.engine, base_url=args.base_url,
+                                   pool_size=args.pool_size)
 
-#pool_size = min(32, os.cpu_count() + 4)
-#webdriver_pool = WebDriverPool(pool_size, set_driver_options())
-#
-#data = []
-#key_worker = SeleniumWorker(webdriver_pool)
-#keys = key_worker.fetch_company_keys()
-#
-#while keys is None: continue
-#
-#with ThreadPoolExecutor() as main_executor:
-#    worker = SeleniumWorker(webdriver_pool)
-#    main_futures = [main_executor.submit(worker.fetch_data_for_10_years_with_key(key)) for key in keys]
-#    for future in as_completed(main_futures):
-#        future.result()  # Wait for main tasks to complete
-#webdriver_pool.close_all()
+    pipe_filter.filter_data()
+
+    # Only the company-years written by this run are rewritten
+    if not args.no_archive:
+        archived = sync_archive()
+        if archived is not None:
+            print(f"Archive updated: {archived['written']} partitions written, {archived['removed']} removed "
+                  f"in {archived['seconds']:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from Scraper.fixture_server import FixtureServer
+from Scraper.http_scraper import HttpWorker
+from Scraper.http_session_pool import HttpSessionPool
+
+MAINTENANCE_PAGE = """<!DOCTYPE html>
+<html lang="mk">
+<head><meta charset="utf-8"><title>Македонска берза</title></head>
+<body>
+<table class="layout"><tr><td>Страницата е привремено недостапна.</td></tr></table>
+</body>
+</html>
+"""
+
+
+class FixtureServerTest(unittest.TestCase):
+    """
+        The HTTP engine against the recorded pages in Scraper/fixtures, served offline.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FixtureServer().start()
+        cls.pool = HttpSessionPool(2)
+        cls.worker = HttpWorker(cls.pool, cls.server.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close_all()
+        cls.server.stop()
+
+    def test_company_keys(self):
+        self.assertEqual(self.worker.fetch_company_keys(), ['ALKB', 'KMB', 'MPT'])
+
+    def test_page_rows(self):
+        table_rows = self.worker.fetch_page('01.12.2024', '31.12.2024', 'ALKB')
+        rows = self.worker.build_company_rows('ALKB', table_rows)
+
+        self.assertEqual(len(rows), 21)
+        self.assertEqual(rows[0]['code'], 'ALKB')
+        self.assertEqual(rows[0]['date'], date(2024, 12, 31))
+        self.assertEqual(rows[0]['last_trade_price'], 18363.0)
+        self.assertEqual(rows[-1]['date'], date(2024, 12, 2))
+
+    def test_page_holds_only_the_requested_window(self):
+        rows = self.worker.build_company_rows('KMB', self.worker.fetch_page('20.12.2024', '27.12.2024', 'KMB'))
+
+        self.assertTrue(rows)
+        self.assertTrue(all(date(2024, 12, 20) <= row['date'] <= date(2024, 12, 27) for row in rows))
+
+
+class TablelessPageTest(unittest.TestCase):
+    """
+        A maintenance or captcha page has no results table and must not pass as an empty window.
+    """
+
+    def setUp(self):
+        self.fixtures = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.fixtures.name, 'symbolhistory'))
+        with open(os.path.join(self.fixtures.name, 'symbolhistory', 'ALKB.html'), 'w', encoding='utf-8') as f:
+            f.write(MAINTENANCE_PAGE)
+        self.server = FixtureServer(self.fixtures.name).start()
+        self.pool = HttpSessionPool(1)
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.server.stop()
+        self.fixtures.cleanup()
+
+    def test_page_without_results_table_raises(self):
+        worker = HttpWorker(self.pool, self.server.url)
+
+        with self.assertRaises(RuntimeError):
+            worker.fetch_page('01.12.2024', '31.12.2024', 'ALKB')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from datetime import date
+
+from PipeFilterSystem.ingestion import IngestionStage
+
+
+def checkpoint(code):
+    return {'code': code, 'window_start': date(2024, 1, 1), 'window_end': date(2024, 12, 31), 'rows': 0,
+            'completed_at': None}
+
+
+class FailedWriteTest(unittest.TestCase):
+    """
+        A rolled back batch marks its companies as failed, even when it only held a checkpoint.
+    """
+
+    def test_failed_checkpoint_only_window_is_reported(self):
+        results = []
+        stage = IngestionStage(write=lambda rows, checkpoints: None)
+        stage.put([], results.append, checkpoint('ALKB'))
+        stage.close()
+
+        self.assertEqual(results, [None])
+        self.assertEqual(stage.failed_codes, {'ALKB'})
+
+    def test_window_without_rows_is_not_a_failure(self):
+        results = []
+        stage = IngestionStage(write=lambda rows, checkpoints: len(rows))
+        stage.put([], results.append, checkpoint('ALKB'))
+        stage.close()
+
+        self.assertEqual(results, [0])
+        self.assertEqual(stage.failed_codes, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import unittest
+from datetime import date
+
+from Scraper.http_scraper import TableRowParser, HISTORY_TABLE_ID
+from Scraper.row_parser import TableParseError, parse_history_table, history_records
+
+PARSER_FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Scraper', 'fixtures', 'parser')
+
+
+def table_rows(name):
+    parser = TableRowParser(HISTORY_TABLE_ID)
+    with open(os.path.join(PARSER_FIXTURES, name), encoding='utf-8') as f:
+        parser.feed(f.read())
+    parser.close()
+    return parser.rows
+
+
+class ParseHistoryTableTest(unittest.TestCase):
+
+    def test_partial_row_is_rejected(self):
+        with self.assertRaises(TableParseError):
+            parse_history_table(table_rows('partial_row.html'))
+
+    def test_cells_outside_the_results_table_are_ignored(self):
+        table = parse_history_table(table_rows('extra_cells.html'))
+
+        self.assertEqual(len(table), 20)
+        records = history_records('ALKB', table)
+        self.assertEqual(records[0]['date'], date(2023, 12, 29))
+        self.assertEqual(records[0]['last_trade_price'], 17928.0)
+        self.assertEqual(records[0]['volume'], 279)
+
+    def test_empty_table_gives_no_rows(self):
+        self.assertEqual(len(parse_history_table(table_rows('empty.html'))), 0)
+
+    def test_year_keeps_every_dated_row(self):
+        rows = table_rows('year.html')
+        table = parse_history_table(rows)
+
+        self.assertEqual(len(table), len(rows))
+        self.assertTrue(all(day.year == 2023 for day in table['date'].astype(object)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from app.server import app, MAX_INDICATOR_WINDOW
+
+
+class QueryValidationTest(unittest.TestCase):
+    """
+        Bad query parameters are answered with 400 before any data is loaded.
+    """
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def assertRejected(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 400, url)
+        self.assertIn('error', response.get_json())
+
+    def test_indicator_windows_must_be_positive(self):
+        self.assertRejected('/api/ohlcv/ALKB?window_sma=0')
+        self.assertRejected('/api/ohlcv/ALKB?window_ema=-5')
+
+    def test_indicator_windows_are_capped(self):
+        self.assertRejected(f'/api/ohlcv/ALKB?window_sma={MAX_INDICATOR_WINDOW + 1}')
+
+    def test_indicator_windows_must_be_whole_numbers(self):
+        self.assertRejected('/api/ohlcv/ALKB?window_sma=abc')
+        self.assertRejected('/api/ohlcv/ALKB?window_ema=2.5')
+
+    def test_screener_limit_must_not_be_negative(self):
+        self.assertRejected('/screener?limit=-1')
+
+    def test_screener_filters_must_be_numbers(self):
+        self.assertRejected('/screener?min_rsi_14=low')
+        self.assertRejected('/screener?max_volume=nan')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from datetime import date, datetime, timedelta
+
+from Scraper.sync_planner import SyncPlanner, completed_window, is_trading_day
+
+
+def trading_days(start, end):
+    days = []
+    while start <= end:
+        if is_trading_day(start):
+            days.append(start)
+        start += timedelta(days=1)
+    return days
+
+
+class CheckpointThroughTodayTest(unittest.TestCase):
+    """
+        A window fetched during the trading day ends on a day whose close isn't in yet.
+    """
+
+    def test_window_ending_today_is_final_up_to_yesterday(self):
+        checkpoint = completed_window(date(2023, 10, 1), date(2023, 10, 18), datetime(2023, 10, 18, 11, 30))
+        self.assertEqual(checkpoint, (date(2023, 10, 1), date(2023, 10, 17)))
+
+    def test_window_of_only_today_is_not_final(self):
+        self.assertIsNone(completed_window(date(2023, 10, 18), date(2023, 10, 18), datetime(2023, 10, 18, 11, 30)))
+
+    def test_past_window_is_kept_whole(self):
+        checkpoint = completed_window(date(2023, 1, 1), date(2023, 6, 30), datetime(2023, 10, 18, 11, 30))
+        self.assertEqual(checkpoint, (date(2023, 1, 1), date(2023, 6, 30)))
+
+    def test_day_of_the_checkpoint_is_fetched_again_next_run(self):
+        # Stored up to Monday 16.10, a run on Wednesday 18.10 fetched up to 18.10, next run on 19.10
+        dates = trading_days(date(2023, 1, 2), date(2023, 10, 16))
+        checkpoint = completed_window(date(2023, 10, 17), date(2023, 10, 18), datetime(2023, 10, 18, 11, 30))
+
+        windows = SyncPlanner(today=date(2023, 10, 19)).plan_for_code(dates, [checkpoint])
+
+        self.assertEqual(windows, [('18.10.2023', '19.10.2023')])
+
+
+class ClippedPageTest(unittest.TestCase):
+    """
+        A page can lose its oldest rows without reaching the row cap.
+    """
+
+    def setUp(self):
+        self.planner = SyncPlanner(today=date(2024, 12, 20))
+        self.planner.dates_by_code = {
+            'DAILY': trading_days(date(2020, 1, 1), date(2023, 12, 31)),
+            'RARE': trading_days(date(2020, 1, 1), date(2023, 12, 31))[::20],
+        }
+
+    def test_daily_issuer_starting_months_late_is_clipped(self):
+        self.assertTrue(self.planner.is_clipped('DAILY', date(2024, 1, 1), date(2024, 7, 1)))
+
+    def test_daily_issuer_starting_after_the_holidays_is_complete(self):
+        self.assertFalse(self.planner.is_clipped('DAILY', date(2024, 1, 1), date(2024, 1, 3)))
+
+    def test_gap_is_measured_in_the_issuers_own_trades(self):
+        self.assertFalse(self.planner.is_clipped('RARE', date(2024, 1, 1), date(2024, 7, 1)))
+
+    def test_issuer_without_rows_is_not_judged(self):
+        self.assertFalse(self.planner.is_clipped('NEW', date(2024, 1, 1), date(2024, 12, 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import time
+import unittest
+
+from Scraper.web_driver_pool import WebDriverPool, _DriverInfo
+
+
+class FakeDriver:
+    current_url = 'about:blank'
+
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeDriverPool(WebDriverPool):
+    # Hands out fake drivers instead of starting Chrome
+    def _create_driver(self):
+        driver = FakeDriver()
+        with self._condition:
+            self._info[id(driver)] = _DriverInfo()
+            self.created += 1
+        return driver
+
+
+class IdleShrinkTest(unittest.TestCase):
+
+    def test_release_shuts_down_drivers_that_idled_out(self):
+        pool = FakeDriverPool(2, None, idle_timeout=0.05)
+        first, second = pool.get_driver(), pool.get_driver()
+        pool.release_driver(first)
+        time.sleep(0.1)
+
+        pool.release_driver(second)
+
+        self.assertTrue(first.quit_called)
+        self.assertFalse(second.quit_called)
+        self.assertEqual(pool.stats()['idle'], 1)
+        pool.close_all()
+
+    def test_memory_recycling_is_on_by_default(self):
+        self.assertIsNotNone(FakeDriverPool(1, None).max_memory_mb)
+
+
+if __name__ == '__main__':
+    unittest.main()